@@ -0,0 +1,61 @@
+# 自动玩家决策速度测试：报告每秒评估的落点数、每个方块的决策耗时和置换表命中率
+#
+#   python benchmarks/bench_ai.py --pieces 2000 --board bit
+#   python benchmarks/bench_ai.py --no-lookahead
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tetris_ai import AutoPlayer  # noqa: E402
+from tetris_board import BOARD_TYPES  # noqa: E402
+from tetris_engine import TetrisEngine  # noqa: E402
+
+FRAME_BUDGET = 1000 / 60  # 毫秒，决策应远小于一帧
+
+
+def run(pieces, seed, board_type, lookahead):
+    engine = TetrisEngine(board_type=board_type, seed=seed)
+    player = AutoPlayer(lookahead=lookahead)
+    decisions = []
+    while len(decisions) < pieces:
+        if engine.game_over:
+            engine.reset(seed + len(decisions))
+        start = time.perf_counter()
+        actions = player.plan(engine)
+        decisions.append(time.perf_counter() - start)
+        step = engine.step
+        for action in actions:
+            step(action)
+    return player, decisions
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动玩家决策速度测试")
+    parser.add_argument("--pieces", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board", choices=sorted(BOARD_TYPES), default="bit")
+    parser.add_argument("--no-lookahead", action="store_true")
+    args = parser.parse_args()
+
+    player, decisions = run(args.pieces, args.seed, args.board, not args.no_lookahead)
+    total = sum(decisions)
+    decisions.sort()
+    print(f"board={args.board} lookahead={not args.no_lookahead} pieces={len(decisions)} time={total:.3f}s")
+    print(f"placements/sec: {player.placements_evaluated / total:,.0f}")
+    print(f"decision: avg={total / len(decisions) * 1000:.2f}ms p50={percentile(decisions, 0.5) * 1000:.2f}ms "
+          f"p99={percentile(decisions, 0.99) * 1000:.2f}ms max={decisions[-1] * 1000:.2f}ms "
+          f"(frame budget {FRAME_BUDGET:.1f}ms)")
+    for name, table in (("decisions", player.decisions), ("evaluations", player.evaluations)):
+        lookups = table.hits + table.misses
+        print(f"{name} table: size={len(table)} hit rate={table.hits / max(lookups, 1):.1%}")
+
+
+if __name__ == "__main__":
+    main()
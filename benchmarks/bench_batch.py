@@ -0,0 +1,103 @@
+# 批量引擎吞吐量测试：与单棋盘引擎对比每个动作的耗时
+#
+#   python benchmarks/bench_batch.py --boards 4096 --steps 2000
+#
+# 计时结束后逐个棋盘比较批量引擎与单棋盘引擎（同样的种子和动作）的
+# 分数、行数、方块数、步数、游戏结束标志、当前方块和最终的每一行，不一致时退出码为1。
+import argparse
+import os
+import sys
+import time
+
+import numpy as np  # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tetris_batch import BatchTetrisEngine  # noqa: E402
+from tetris_engine import TetrisEngine, NOOP, LEFT, RIGHT, DOWN, ROTATE, TICK, HARD_DROP  # noqa: E402
+
+# 包括不移动方块的 NOOP 和直接落到底的 HARD_DROP，两者的结果也要与单棋盘引擎一致
+RANDOM_ACTIONS = np.array([NOOP, LEFT, RIGHT, ROTATE, DOWN, TICK, TICK, HARD_DROP])
+
+
+def run_batch(boards, steps, seed):
+    engine = BatchTetrisEngine(boards, seeds=range(seed, seed + boards))
+    rng = np.random.default_rng(seed)
+    actions = RANDOM_ACTIONS[rng.integers(len(RANDOM_ACTIONS), size=(steps, boards))]
+    start = time.perf_counter()
+    for row in actions:
+        engine.step(row)
+    elapsed = time.perf_counter() - start
+    return engine, elapsed, actions
+
+
+def run_single(boards, seed, actions):
+    engines = []
+    start = time.perf_counter()
+    for board in range(boards):
+        engine = TetrisEngine(seed=seed + board)
+        step = engine.step
+        for action in actions[:, board].tolist():
+            step(action)
+        engines.append(engine)
+    return engines, time.perf_counter() - start
+
+
+def mismatches(batch, engines):
+    # 逐个棋盘比较最终状态，返回 [(棋盘编号, 字段名, 批量引擎的值, 单棋盘引擎的值)]
+    result = []
+    for board, engine in enumerate(engines):
+        piece = engine.current_piece
+        expected = {
+            'score': engine.score,
+            'lines': engine.lines,
+            'pieces': engine.pieces,
+            'steps': engine.steps,
+            'game_over': engine.game_over,
+            'piece': (piece.kind, piece.rotation, piece.x, piece.y, engine.next_piece.kind),
+            'rows': engine.board.row_masks(),
+        }
+        actual = {
+            'score': int(batch.score[board]),
+            'lines': int(batch.lines[board]),
+            'pieces': int(batch.pieces[board]),
+            'steps': int(batch.steps[board]),
+            'game_over': bool(batch.game_over[board]),
+            'piece': (int(batch.kind[board]), int(batch.rotation[board]), int(batch.x[board]),
+                      int(batch.y[board]), int(batch.next_kind[board])),
+            'rows': tuple(batch.rows[board].tolist()),
+        }
+        for name, value in expected.items():
+            if actual[name] != value:
+                result.append((board, name, actual[name], value))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量引擎吞吐量测试")
+    parser.add_argument("--boards", type=int, default=4096)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    batch, batch_time, actions = run_batch(args.boards, args.steps, args.seed)
+    engines, single_time = run_single(args.boards, args.seed, actions)
+    batch_moves = int(batch.steps.sum())
+    single_moves = sum(engine.steps for engine in engines)
+    print(f"boards={args.boards} steps={args.steps}")
+    print(f"batch:  {batch_moves / batch_time:,.0f} moves/sec")
+    print(f"single: {single_moves / single_time:,.0f} moves/sec")
+    print(f"speedup: {single_time / batch_time:.1f}x")
+
+    errors = mismatches(batch, engines)
+    if errors:
+        print(f"批量引擎与单棋盘引擎不一致：{len(errors)} 处（{len(set(e[0] for e in errors))} 个棋盘）")
+        for board, name, actual, expected in errors[:10]:
+            print(f"  board {board} {name}: batch={actual} single={expected}")
+        return 1
+    print(f"verified: {args.boards} boards match the single-board engine")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+# 无界面引擎吞吐量测试：报告每秒完成的游戏局数和动作数
+#
+#   python benchmarks/bench_engine.py --games 2000 --board bit
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tetris_board import BOARD_TYPES  # noqa: E402
+from tetris_engine import TetrisEngine, LEFT, RIGHT, DOWN, ROTATE, TICK  # noqa: E402
+
+# 随机策略：左右移动和旋转之间穿插重力下落
+RANDOM_ACTIONS = (LEFT, RIGHT, ROTATE, DOWN, TICK, TICK)
+
+
+def run(games, seed, board_type):
+    engine = TetrisEngine(board_type=board_type)
+    rng = random.Random(seed)
+    choice = rng.choice
+    steps = 0
+    start = time.perf_counter()
+    for game in range(games):
+        engine.reset(seed + game)
+        step = engine.step
+        while not engine.game_over:
+            step(choice(RANDOM_ACTIONS))
+        steps += engine.steps
+    return steps, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面引擎吞吐量测试")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board", choices=sorted(BOARD_TYPES), default="bit")
+    args = parser.parse_args()
+
+    steps, elapsed = run(args.games, args.seed, args.board)
+    print(f"board={args.board} games={args.games} moves={steps} time={elapsed:.3f}s")
+    print(f"games/sec: {args.games / elapsed:,.1f}")
+    print(f"moves/sec: {steps / elapsed:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
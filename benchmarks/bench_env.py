@@ -0,0 +1,64 @@
+# 强化学习环境速度测试：随机动作下单个环境和向量化环境每秒的步数
+#
+#   python benchmarks/bench_env.py --steps 100000
+#   python benchmarks/bench_env.py --envs 4096 --features heights holes piece_mask
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np  # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tetris_engine import ACTIONS  # noqa: E402
+from tetris_env import FEATURES, TetrisEnv, VectorTetrisEnv  # noqa: E402
+
+
+def run_single(steps, seed, features):
+    env = TetrisEnv(features=features)
+    env.reset(seed=seed)
+    rng = random.Random(seed)
+    actions = [rng.choice(ACTIONS) for _ in range(steps)]
+    games = 0
+    start = time.perf_counter()
+    for action in actions:
+        _, _, terminated, _, _ = env.step(action)
+        if terminated:
+            games += 1
+            env.reset()
+    return time.perf_counter() - start, games
+
+
+def run_vector(envs, steps, seed, features):
+    env = VectorTetrisEnv(envs, features=features)
+    env.reset(seed=seed)
+    actions = np.random.default_rng(seed).integers(0, len(ACTIONS), (steps, envs))
+    games = 0
+    start = time.perf_counter()
+    for row in actions:
+        _, _, terminated, _, _ = env.step(row)
+        games += int(terminated.sum())
+    return time.perf_counter() - start, games
+
+
+def main():
+    parser = argparse.ArgumentParser(description="强化学习环境速度测试")
+    parser.add_argument("--steps", type=int, default=100000, help="单个环境的步数")
+    parser.add_argument("--envs", type=int, default=1024, help="向量化环境的数量")
+    parser.add_argument("--vector-steps", type=int, default=200)
+    parser.add_argument("--features", nargs="*", choices=FEATURES, default=[])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    features = tuple(args.features)
+    elapsed, games = run_single(args.steps, args.seed, features)
+    print(f"features={','.join(features) or 'none'}")
+    print(f"single: {args.steps / elapsed:,.0f} steps/sec ({games} games)")
+    elapsed, games = run_vector(args.envs, args.vector_steps, args.seed, features)
+    print(f"vector x{args.envs}: {args.envs * args.vector_steps / elapsed:,.0f} env steps/sec ({games} games)")
+
+
+if __name__ == "__main__":
+    main()
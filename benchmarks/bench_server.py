@@ -0,0 +1,229 @@
+# 服务器负载测试：在本机模拟大量同时在线的玩家，报告输入到确认（ACK）的延迟
+#
+#   python benchmarks/bench_server.py --clients 1000 --duration 10
+#   python benchmarks/bench_server.py --port 7777 --no-spawn     连接已经在运行的服务器
+#   python benchmarks/bench_server.py --spectators 300           300个观战者同时观看第一个玩家
+#
+# 默认在临时目录中启动一个 tetris_server.py 子进程（用户数据也在临时目录中），
+# 每个模拟玩家注册并登录自己的账号后开始游戏，按泊松过程随机发送输入，
+# 一局结束后立即开始下一局。延迟从写出输入到收到对应序号的ACK为止，
+# 前 --warmup 秒（大家都在连接和登录）不计入统计。
+# 观战者解码收到的状态帧，报告每帧的平均字节数和每个观战者每秒收到的字节数。
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tetris_stream import FrameReader, StreamDecoder  # noqa: E402
+
+ACTIONS = ('left', 'right', 'rotate', 'down', 'left', 'right', 'rotate', 'drop')
+CONNECT_BATCH = 100  # 每批同时发起的连接数
+LATENCY_TARGET = 5.0  # 毫秒，p99 目标
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.recording = False
+        self.connected = 0
+        self.playing = 0
+        self.games = 0
+        self.rejected = 0
+        self.spectator_frames = 0
+        self.spectator_bytes = 0
+
+
+class LoadClient(asyncio.Protocol):
+    def __init__(self, name, rate, stats, rng):
+        self.name = name
+        self.rate = rate
+        self.stats = stats
+        self.rng = rng
+        self.transport = None
+        self.buffer = b''
+        self.sequence = 0
+        self.pending = {}  # 序号 -> 发送时间
+        self.timer = None
+        self.playing = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_event_loop()
+        self.stats.connected += 1
+        # 注册（已存在时会收到ERR，忽略）、登录、开始游戏一次发出
+        transport.write(f"REGISTER {self.name} pw\nLOGIN {self.name} pw\nSTART\n".encode())
+
+    def connection_lost(self, exc):
+        self.stats.connected -= 1
+        if self.timer is not None:
+            self.timer.cancel()
+
+    def data_received(self, data):
+        self.buffer += data
+        lines = self.buffer.split(b'\n')
+        self.buffer = lines.pop()
+        now = time.perf_counter()
+        for line in lines:
+            words = line.split()
+            kind = words[0]
+            if kind == b'ACK':
+                sent = self.pending.pop(int(words[1]), None)
+                if sent is not None and self.stats.recording:
+                    self.stats.latencies.append(now - sent)
+            elif kind == b'OK' and words[1] == b'START':
+                self.playing = True
+                self.stats.playing += 1
+                self.schedule()
+            elif kind == b'OVER':
+                self.stats.games += 1
+                self.stats.playing -= 1
+                self.playing = False
+                self.transport.write(b"START\n")
+            elif kind == b'ERR':
+                # 包括已存在的用户名，以及在游戏结束之后才到达服务器的输入
+                self.stats.rejected += 1
+
+    def schedule(self):
+        self.timer = self.loop.call_later(self.rng.expovariate(self.rate), self.send_input)
+
+    def send_input(self):
+        self.timer = None
+        if not self.playing:
+            return
+        self.sequence += 1
+        self.pending[self.sequence] = time.perf_counter()
+        self.transport.write(f"{self.sequence} {self.rng.choice(ACTIONS)}\n".encode())
+        self.schedule()
+
+
+class Spectator(asyncio.Protocol):
+    def __init__(self, player, stats):
+        self.player = player
+        self.stats = stats
+        self.reader = None
+        self.decoder = StreamDecoder()
+        self.buffer = b''
+
+    def connection_made(self, transport):
+        transport.write(f"WATCH {self.player}\n".encode())
+
+    def data_received(self, data):
+        if self.reader is None:
+            # 第一行是文字回复，之后都是状态帧
+            self.buffer += data
+            if b'\n' not in self.buffer:
+                return
+            reply, data = self.buffer.split(b'\n', 1)
+            if not reply.startswith(b'OK'):
+                raise RuntimeError(reply.decode('utf-8'))
+            self.reader = FrameReader()
+        for frame in self.reader.feed(data):
+            self.decoder.apply(frame)
+            if self.stats.recording:
+                self.stats.spectator_frames += 1
+                self.stats.spectator_bytes += len(frame)
+
+
+def wait_for_port(host, port, process, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("服务器进程已退出")
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"{timeout}秒内无法连接服务器 {host}:{port}")
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run_load(args, stats):
+    loop = asyncio.get_event_loop()
+    rng = random.Random(args.seed)
+    clients = []
+    start = time.perf_counter()
+    for first in range(0, args.clients, CONNECT_BATCH):
+        batch = [loop.create_connection(
+                     lambda i=i: LoadClient(f"load{i:05d}", args.rate, stats, random.Random(rng.random())),
+                     args.host, args.port)
+                 for i in range(first, min(first + CONNECT_BATCH, args.clients))]
+        clients.extend(await asyncio.gather(*batch))
+    if args.spectators:
+        await asyncio.sleep(0.2)  # 等第一个玩家登录
+        clients.extend(await asyncio.gather(*[loop.create_connection(
+            lambda: Spectator("load00000", stats), args.host, args.port) for _ in range(args.spectators)]))
+    connect_time = time.perf_counter() - start
+    await asyncio.sleep(max(args.warmup - connect_time, 0))
+    stats.recording = True
+    await asyncio.sleep(args.duration)
+    stats.recording = False
+    for transport, _ in clients:
+        transport.close()
+    await asyncio.sleep(0.1)
+    return connect_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="服务器负载测试")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=2.0, help="每个玩家每秒的平均输入次数")
+    parser.add_argument("--duration", type=float, default=10.0, help="统计时长（秒）")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--no-spawn", action="store_true", help="不启动服务器，连接已有的服务器")
+    parser.add_argument("--spectators", type=int, default=0, help="观看第一个玩家的观战者数量")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    process = None
+    directory = None
+    if not args.no_spawn:
+        directory = tempfile.mkdtemp(prefix="tetris_server_")
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "tetris_server.py"),
+                                    "--host", args.host, "--port", str(args.port)],
+                                   cwd=directory, stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.host, args.port, process)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        stats = LoadStats()
+        connect_time = loop.run_until_complete(run_load(args, stats))
+        loop.close()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    latencies = sorted(stats.latencies)
+    print(f"clients={args.clients} rate={args.rate}/s duration={args.duration}s "
+          f"connect+login={connect_time:.2f}s games finished={stats.games} rejected={stats.rejected}")
+    if not latencies:
+        print("no inputs acknowledged")
+        return
+    print(f"inputs acked: {len(latencies)} ({len(latencies) / args.duration:,.0f}/s)")
+    print(f"ack latency: p50={percentile(latencies, 0.5) * 1000:.2f}ms p95={percentile(latencies, 0.95) * 1000:.2f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:.2f}ms max={latencies[-1] * 1000:.2f}ms "
+          f"(target p99 < {LATENCY_TARGET:.0f}ms)")
+    if stats.spectator_frames:
+        print(f"spectators: {args.spectators} frames received={stats.spectator_frames} "
+              f"avg {stats.spectator_bytes / stats.spectator_frames:.1f} bytes/frame "
+              f"{stats.spectator_bytes / args.spectators / args.duration:.0f} bytes/s per spectator")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# 快照速度和内存测试：snapshot()/restore() 与深复制整个引擎比较
+#
+#   python benchmarks/bench_snapshot.py --steps 100000 --board bit
+#
+# 随机玩一局（结束后重开），每一步都保存一个快照，报告：
+#   每个快照平均占用的内存（tracemalloc 统计，包括锁定之间共用的棋盘部分）
+#   每个不同的锁定状态（棋盘、方块序列、分数等，每次锁定一个）占用的内存，以及其中
+#   棋盘部分的内存：同样的对局再玩两次，只保留每次锁定后的快照或棋盘快照
+#   snapshot / restore / copy.deepcopy 的耗时
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tetris_board import BOARD_TYPES  # noqa: E402
+from tetris_engine import ACTIONS, TetrisEngine  # noqa: E402
+
+
+def play(engine, steps, seed, keep='step'):
+    # 返回 (保留的快照列表, 占用的字节数)。keep 为 'step' 时保留每一步的快照，
+    # 'locked' 只保留每个不同锁定状态的第一个快照，'board' 只保留其中的棋盘快照
+    rng = random.Random(seed)
+    actions = [rng.choice(ACTIONS) for _ in range(steps)]
+    engine.reset(seed)
+    snapshots = []
+    locked = None
+    game = 0
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for action in actions:
+        if engine.game_over:
+            game += 1
+            engine.reset(seed + game)
+        engine.step(action)
+        snapshot = engine.snapshot()
+        if keep == 'step':
+            snapshots.append(snapshot)
+        elif snapshot.locked is not locked:
+            locked = snapshot.locked
+            snapshots.append(locked if keep == 'locked' else locked[0])
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return snapshots, used
+
+
+def time_per_call(function, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="快照速度和内存测试")
+    parser.add_argument("--steps", type=int, default=100000)
+    parser.add_argument("--board", choices=sorted(BOARD_TYPES), default="bit")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = TetrisEngine(board_type=args.board, seed=args.seed)
+    locked, locked_used = play(engine, args.steps, args.seed, keep='locked')
+    boards, board_used = play(engine, args.steps, args.seed, keep='board')
+    del locked, boards
+    snapshots, used = play(engine, args.steps, args.seed)
+    locks = len(set(id(snapshot.locked) for snapshot in snapshots))
+    print(f"board={args.board} snapshots={len(snapshots)} ({locks} distinct board states)")
+    tracemalloc.start()
+    copies = [copy.deepcopy(engine) for _ in range(100)]
+    copy_bytes = tracemalloc.get_traced_memory()[0] / len(copies)
+    tracemalloc.stop()
+    del copies
+    print(f"memory: {used / len(snapshots):.0f} bytes/snapshot, deepcopy {copy_bytes:.0f} bytes/copy")
+    print(f"per distinct locked state: {locked_used / locks:.0f} bytes (board {board_used / locks:.0f} bytes)")
+
+    rng = random.Random(args.seed)
+    recent = snapshots[-1]
+    anywhere = [rng.choice(snapshots) for _ in range(10000)]
+    picks = iter(anywhere * 10)
+    print(f"snapshot:               {time_per_call(engine.snapshot, 100000):7.2f} us")
+    print(f"restore (same piece):   {time_per_call(lambda: engine.restore(recent), 100000):7.2f} us")
+    print(f"restore (random):       {time_per_call(lambda: engine.restore(next(picks)), 100000):7.2f} us")
+    print(f"copy.deepcopy(engine):  {time_per_call(lambda: copy.deepcopy(engine), 2000):7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
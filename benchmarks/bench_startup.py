@@ -0,0 +1,90 @@
+# 冷启动时间测试：从启动Python进程到画出登录界面第一帧的耗时
+#
+#   python benchmarks/bench_startup.py --runs 10
+#
+# 每次启动一个新的子进程（默认使用SDL的dummy驱动），分别测量：
+#   cold  删除字体路径缓存后启动（需要查找系统字体）
+#   warm  使用上次保存的字体路径缓存启动
+# 另外单独测量一次 pygame.init()（初始化全部子系统，包括音频）作为参考。
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程：在临时目录中打开登录界面并画出第一帧，输出各阶段耗时（毫秒）
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import tetris
+from tetris_users import JsonUserStore, UserManager
+imported = time.perf_counter()
+screen = tetris.LoginScreen(UserManager(JsonUserStore("users.json")))
+screen.draw()
+drawn = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - start) * 1000, "login_ms": (drawn - imported) * 1000}}))
+"""
+
+# 参考：原来在导入时调用的 pygame.init()
+CHILD_INIT_ALL = """
+import json, time
+import pygame
+start = time.perf_counter()
+pygame.init()
+print(json.dumps({"init_all_ms": (time.perf_counter() - start) * 1000}))
+"""
+
+
+def launch(code, directory, env):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=directory, env=env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    result["total_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def summarize(label, runs):
+    keys = [key for key in runs[0] if key.endswith("_ms")]
+    print(f"{label:<6}" + "".join(f"{key[:-3]:>10} {statistics.median(run[key] for run in runs):8.1f}ms"
+                                   for key in keys))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动时间测试")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--video-driver", default="dummy", help="SDL_VIDEODRIVER，空字符串表示使用真实显示")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    if args.video_driver:
+        env["SDL_VIDEODRIVER"] = args.video_driver
+    directory = tempfile.mkdtemp(prefix="tetris_startup_")
+    try:
+        code = CHILD.format(root=ROOT)
+        font_cache = os.path.join(directory, "tetris_fonts.json")
+        cold = []
+        for _ in range(args.runs):
+            if os.path.exists(font_cache):
+                os.remove(font_cache)
+            cold.append(launch(code, directory, env))
+        warm = [launch(code, directory, env) for _ in range(args.runs)]
+        init_all = [launch(CHILD_INIT_ALL, directory, env) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"median of {args.runs} launches (total = process start to first login frame)")
+    summarize("cold", cold)
+    summarize("warm", warm)
+    summarize("ref", init_all)
+
+
+if __name__ == "__main__":
+    main()
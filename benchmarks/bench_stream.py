@@ -0,0 +1,122 @@
+# 状态流测试：编码和解码的速度、每帧的字节数，并检查解码结果与引擎完全一致
+#
+#   python benchmarks/bench_stream.py --steps 100000
+#   python benchmarks/bench_stream.py --board ring --width 40 --height 400 --keyframe-interval 50
+#
+# AI玩游戏（偶尔插入随机动作，结束后重开），每一步之后编码一帧并记下引擎的状态。
+# 计时之后再用另一个解码器逐帧解码（帧经过 pack_frame 并在随机位置切开后交给
+# FrameReader），每帧比较棋盘的每一行、当前方块、下一个方块、分数、行数和结束标志，
+# 不一致时退出码为1。
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tetris_ai import AutoPlayer  # noqa: E402
+from tetris_board import BOARD_TYPES  # noqa: E402
+from tetris_engine import TetrisEngine, GRID_WIDTH, GRID_HEIGHT, LEFT, RIGHT, DOWN, ROTATE, TICK  # noqa: E402
+from tetris_stream import KEYFRAME_INTERVAL, FrameReader, StreamDecoder, StreamEncoder, pack_frame  # noqa: E402
+
+RANDOM_ACTIONS = (LEFT, RIGHT, DOWN, ROTATE, TICK)
+
+
+def engine_state(engine):
+    piece = engine.current_piece
+    return (engine.board.row_kinds(), (piece.kind, piece.rotation, piece.x, piece.y), engine.next_piece.kind,
+            engine.score, engine.lines, engine.game_over)
+
+
+def decoder_state(decoder):
+    return (tuple(decoder.rows), decoder.piece, decoder.next_kind, decoder.score, decoder.lines,
+            decoder.game_over)
+
+
+def play(engine, steps, seed, keyframe_interval):
+    # 返回 (帧列表, 每帧之后引擎的状态, 编码耗时)
+    encoder = StreamEncoder(engine, keyframe_interval)
+    player = AutoPlayer(lookahead=False)
+    rng = random.Random(seed)
+    frames = []
+    states = []
+    encode_time = 0.0
+    for step in range(steps):
+        if engine.game_over:
+            engine.reset(seed + step)
+            player.reset()
+        if rng.random() < 0.1:
+            action = rng.choice(RANDOM_ACTIONS)
+        else:
+            action = player.next_action(engine)
+        if not engine.step(action):
+            player.reset()
+        start = time.perf_counter()
+        frame = encoder.encode()
+        encode_time += time.perf_counter() - start
+        if frame is not None:
+            frames.append(frame)
+            states.append(engine_state(engine))
+    return frames, states, encode_time
+
+
+def decode(frames):
+    decoder = StreamDecoder()
+    apply = decoder.apply
+    start = time.perf_counter()
+    for frame in frames:
+        apply(frame)
+    return time.perf_counter() - start
+
+
+def verify(frames, states, seed):
+    # 返回第一个不一致的帧号，全部一致时返回None
+    decoder = StreamDecoder()
+    reader = FrameReader()
+    rng = random.Random(seed)
+    received = []
+    for frame in frames:
+        data = pack_frame(frame)
+        cut = rng.randrange(len(data) + 1)
+        received.extend(reader.feed(data[:cut]))
+        received.extend(reader.feed(data[cut:]))
+    if received != frames:
+        return len(received)
+    for index, (frame, state) in enumerate(zip(frames, states)):
+        decoder.apply(frame)
+        if decoder_state(decoder) != state:
+            return index
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="状态流编码解码测试")
+    parser.add_argument("--steps", type=int, default=100000)
+    parser.add_argument("--board", choices=sorted(BOARD_TYPES) + ['auto'], default="auto")
+    parser.add_argument("--width", type=int, default=GRID_WIDTH)
+    parser.add_argument("--height", type=int, default=GRID_HEIGHT)
+    parser.add_argument("--keyframe-interval", type=int, default=KEYFRAME_INTERVAL)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = TetrisEngine(args.width, args.height, args.board, seed=args.seed)
+    frames, states, encode_time = play(engine, args.steps, args.seed, args.keyframe_interval)
+    decode_time = decode(frames)
+    total = sum(len(frame) for frame in frames)
+    print(f"board={args.board} {args.width}x{args.height} steps={args.steps} frames={len(frames)} "
+          f"keyframe interval={args.keyframe_interval}")
+    print(f"bytes: {total / len(frames):.2f}/frame  keyframe {len(StreamEncoder(engine).keyframe())}")
+    print(f"encode: {encode_time / len(frames) * 1e6:.2f} us/frame  "
+          f"decode: {decode_time / len(frames) * 1e6:.2f} us/frame")
+
+    mismatch = verify(frames, states, args.seed)
+    if mismatch is not None:
+        print(f"解码结果与引擎不一致：第 {mismatch} 帧")
+        return 1
+    print(f"verified: {len(frames)} decoded frames match the engine")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
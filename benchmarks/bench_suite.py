@@ -0,0 +1,410 @@
+# 热点函数的基准测试和性能回归检查（使用SDL的dummy驱动，不需要显示器）
+#
+#   python benchmarks/bench_suite.py --output results.json
+#   python benchmarks/bench_suite.py --baseline baseline.json --threshold 0.25
+#   python benchmarks/bench_suite.py --baseline baseline.json --case-threshold "draw/*=0.5"
+#   python benchmarks/bench_suite.py --baseline baseline.json --update-baseline
+#
+# 测试项：
+#   valid_move / merge_piece / new_piece / draw   普通棋盘和最坏情况棋盘
+#   clear_lines/0 .. clear_lines/4                一次消除0到4行
+#   clear_lines/tall/<棋盘类型>                   40x400的高棋盘上一次消除4行
+#   users/login、users/register、users/save_users  不同的用户数量
+# 每项运行 repeat 轮、每轮 number 次，记录每次操作的最好和中位耗时（微秒）。
+# 结果写成JSON；给出基准文件时逐项比较最好耗时，超过阈值的算作回归，退出码为1。
+# 计时之前先检查所有棋盘实现的结果完全相同（高棋盘上一次消4行，以及AI在高棋盘上
+# 玩几局时每一步之后的棋盘和分数），不一致时同样退出码为1。
+import argparse
+import copy
+import fnmatch
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame  # type: ignore  # noqa: E402
+
+import tetris  # noqa: E402
+from bench_users import make_users  # noqa: E402
+from tetris_ai import AutoPlayer  # noqa: E402
+from tetris_board import BOARD_TYPES  # noqa: E402
+from tetris_engine import TetrisEngine, GRID_WIDTH, GRID_HEIGHT, LEFT, RIGHT, ROTATE, TICK  # noqa: E402
+from tetris_pieces import PieceState, PIECE_COUNT  # noqa: E402
+from tetris_users import UserManager, open_user_store  # noqa: E402
+
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.25  # 比基准慢25%以上算回归
+USER_SIZES = "1000,10000,100000"
+VERIFY_GAMES = 3  # 检查棋盘实现时AI玩的局数
+VERIFY_PIECES = 300  # 每局最多的方块数
+
+# 单个格子的“方块”，用来直接往棋盘上填格子，棋盘的统计信息也随之更新
+CELL = PieceState(cells=((0, 0),), width=1, height=1, top=(0,), bottom=(0,), masks=(1,), nibbles=(1,))
+
+
+def fill_rows(board, rows, rng, density):
+    # 把最下面的rows行按density随机填上格子，每行至少留一个空格，不会被消除
+    for i in range(board.height - rows, board.height):
+        gap = rng.randrange(board.width)
+        for j in range(board.width):
+            if j != gap and rng.random() < density:
+                board.merge(CELL, j, i, rng.randrange(PIECE_COUNT))
+
+
+def make_board(case, seed=0, cleared=0, board_type='bit', width=GRID_WIDTH, height=GRID_HEIGHT):
+    # typical  下面8行有七成的格子，常见的对局中盘
+    # worst    除了顶上两行都填满（每行留一个空格），格子最多，方块要检查的行也最多
+    # tall     下面四分之三的行有七成的格子
+    engine = TetrisEngine(width, height, board_type, seed=seed)
+    rng = random.Random(seed)
+    board = engine.board
+    if case == 'typical':
+        fill_rows(board, 8, rng, 0.7)
+    elif case == 'tall':
+        fill_rows(board, height * 3 // 4, rng, 0.7)
+    else:
+        fill_rows(board, height - 2, rng, 1.0)
+    if cleared:
+        # 把最下面几行换成满行
+        for i in range(board.height - cleared, board.height):
+            for j in range(board.width):
+                if not board.cell(i, j):
+                    board.merge(CELL, j, i, rng.randrange(PIECE_COUNT))
+    return engine
+
+
+def landed(engine):
+    # 让当前方块停在最终会落到的位置
+    piece = engine.current_piece
+    piece.y = engine.landing_y(piece)
+    return engine
+
+
+def bench_valid_move(case):
+    def make(number):
+        engine = make_board(case)
+        piece = engine.current_piece
+        positions = [(x, y) for y in range(engine.height) for x in range(-1, engine.width)]
+        positions = (positions * (number // len(positions) + 1))[:number]
+        valid_move = engine.valid_move
+
+        def run():
+            for x, y in positions:
+                valid_move(piece, x, y)
+        return run
+    return make
+
+
+def bench_merge_piece(case):
+    def make(number):
+        engine = landed(make_board(case))
+        boards = [copy.deepcopy(engine.board) for _ in range(number)]
+
+        def run():
+            for board in boards:
+                engine.board = board
+                engine.merge_piece()
+        return run
+    return make
+
+
+def make_cleared_board(case, lines, board_type, width, height):
+    engine = make_board(case, cleared=lines, board_type=board_type, width=width, height=height)
+    if lines and board_type == 'ring':
+        # RingBoard 只检查上一次合并覆盖的行，这里假设刚在最下面几行合并了方块
+        engine.board.merged = (height - lines, height)
+    return engine
+
+
+def bench_clear_lines(lines, case='typical', board_type='bit', width=GRID_WIDTH, height=GRID_HEIGHT):
+    def make(number):
+        engine = make_cleared_board(case, lines, board_type, width, height)
+        board = engine.board
+        boards = [copy.deepcopy(board) for _ in range(number)]
+
+        def run():
+            for board in boards:
+                engine.board = board
+                engine.clear_lines()
+        return run
+    return make
+
+
+def bench_new_piece():
+    def make(number):
+        engine = TetrisEngine(seed=0)
+        new_piece = engine.new_piece
+
+        def run():
+            for _ in range(number):
+                new_piece()
+        return run
+    return make
+
+
+class DrawFixture:
+    # 一个登录了测试用户的游戏窗口，用于测量完整的一帧绘制
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="tetris_bench_")
+        store = open_user_store('json', os.path.join(self.directory, "users.json"))
+        self.user_manager = UserManager(store)
+        self.user_manager.register_user("bench", "pw")
+        self.user_manager.login("bench", "pw")
+        self.user_manager.update_user_stats(1200)
+        self.game = tetris.Tetris(self.user_manager, self.user_manager.current_user)
+
+    def close(self):
+        self.user_manager.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def bench_draw(fixture, case):
+    def make(number):
+        game = fixture.game
+        game.engine = make_board(case)
+
+        def run():
+            for _ in range(number):
+                game.full_redraw = True
+                game.draw()
+        return run
+    return make
+
+
+class UserFixture:
+    # 预先写好size个用户的数据库，每轮测试打开一个新的UserManager
+    def __init__(self, size):
+        self.size = size
+        self.directory = tempfile.mkdtemp(prefix="tetris_bench_users_")
+        self.json_path = os.path.join(self.directory, "users.json")
+        self.db_path = os.path.join(self.directory, "users.db")
+        store = open_user_store('sqlite', self.json_path, self.db_path)
+        store.save_all(make_users(size))
+        store.close()
+        self.managers = []
+
+    def manager(self):
+        manager = UserManager(open_user_store('sqlite', self.json_path, self.db_path, write_behind=True))
+        self.managers.append(manager)
+        return manager
+
+    def close(self):
+        for manager in self.managers:
+            manager.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def bench_login(fixture):
+    def make(number):
+        manager = fixture.manager()
+        rng = random.Random(number)
+        names = [f"user{rng.randint(1, fixture.size)}" for _ in range(number)]
+
+        def run():
+            for name in names:
+                manager.login(name, "pw")
+        return run
+    return make
+
+
+def bench_register(fixture):
+    def make(number):
+        manager = fixture.manager()
+        prefix = f"new{len(fixture.managers)}_"
+        names = [f"{prefix}{i}" for i in range(number)]
+
+        def run():
+            for name in names:
+                manager.register_user(name, "pw")
+            manager.store.flush()
+        return run
+    return make
+
+
+def bench_save_users(fixture):
+    def make(number):
+        manager = fixture.manager()
+
+        def run():
+            for _ in range(number):
+                manager.save_users()
+                manager.store.flush()
+        return run
+    return make
+
+
+def board_state(engine):
+    return (engine.score, engine.lines, engine.pieces, engine.game_over, engine.board.row_kinds())
+
+
+def verify_board_types(games=VERIFY_GAMES, pieces=VERIFY_PIECES):
+    # 返回不一致的描述列表；以位棋盘为参照
+    errors = []
+    others = sorted(set(BOARD_TYPES) - {'bit'})
+    reference = make_cleared_board('tall', 4, 'bit', 40, 400)
+    reference.clear_lines()
+    for board_type in others:
+        engine = make_cleared_board('tall', 4, board_type, 40, 400)
+        engine.clear_lines()
+        if board_state(engine) != board_state(reference):
+            errors.append(f"clear_lines/tall: {board_type} != bit")
+    for seed in range(games):
+        reference = TetrisEngine(10, 100, 'bit', seed=seed)
+        engines = {board_type: TetrisEngine(10, 100, board_type, seed=seed) for board_type in others}
+        player = AutoPlayer(lookahead=False)
+        rng = random.Random(seed)
+        while not reference.game_over and reference.pieces < pieces and not errors:
+            # 偶尔插入随机动作，留下空洞和不整齐的行
+            action = player.next_action(reference) if rng.random() < 0.9 else rng.choice((LEFT, RIGHT, ROTATE, TICK))
+            if not reference.step(action):
+                player.reset()
+            for board_type, engine in engines.items():
+                engine.step(action)
+                if board_state(engine) != board_state(reference):
+                    errors.append(f"game seed={seed} piece={reference.pieces}: {board_type} != bit")
+    return errors
+
+
+def build_cases(user_sizes):
+    # 返回 [(名字, make, 每轮次数)] 和需要在结束时清理的对象
+    cases = []
+    for case in ('typical', 'worst'):
+        cases.append((f"valid_move/{case}", bench_valid_move(case), 20000))
+    for case in ('typical', 'worst'):
+        cases.append((f"merge_piece/{case}", bench_merge_piece(case), 2000))
+    for lines in range(5):
+        cases.append((f"clear_lines/{lines}", bench_clear_lines(lines), 2000))
+    for board_type in sorted(BOARD_TYPES):
+        cases.append((f"clear_lines/tall/{board_type}", bench_clear_lines(4, 'tall', board_type, 40, 400), 100))
+    cases.append(("new_piece", bench_new_piece(), 20000))
+    draw_fixture = DrawFixture()
+    fixtures = [draw_fixture]
+    for case in ('typical', 'worst'):
+        cases.append((f"draw/{case}", bench_draw(draw_fixture, case), 50))
+    for size in user_sizes:
+        fixture = UserFixture(size)
+        fixtures.append(fixture)
+        cases.append((f"users/login/{size}", bench_login(fixture), 2000))
+        cases.append((f"users/register/{size}", bench_register(fixture), 20))
+        cases.append((f"users/save_users/{size}", bench_save_users(fixture), 1))
+    return cases, fixtures
+
+
+def measure(make, number, repeat):
+    # 每轮重新准备输入，只计 run() 的时间
+    per_op = []
+    for _ in range(repeat):
+        run = make(number)
+        start = time.perf_counter()
+        run()
+        per_op.append((time.perf_counter() - start) / number * 1e6)
+    return {"best_us": min(per_op), "median_us": statistics.median(per_op), "number": number,
+            "repeat": repeat}
+
+
+def case_threshold(name, default, overrides):
+    # 后给出的规则优先
+    for pattern, value in reversed(overrides):
+        if fnmatch.fnmatchcase(name, pattern):
+            return value
+    return default
+
+
+def compare(results, baseline, threshold, overrides):
+    # 返回回归的测试项，同时打印对比表
+    regressions = []
+    print(f"{'case':<30}{'baseline us':>14}{'now us':>12}{'change':>10}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<30}{'-':>14}{result['best_us']:>12.3f}{'new':>10}")
+            continue
+        change = result['best_us'] / base['best_us'] - 1
+        limit = case_threshold(name, threshold, overrides)
+        flag = "  REGRESSION" if change > limit else ""
+        print(f"{name:<30}{base['best_us']:>14.3f}{result['best_us']:>12.3f}{change:>+10.1%}{flag}")
+        if change > limit:
+            regressions.append(name)
+    return regressions
+
+
+def parse_override(text):
+    pattern, _, value = text.rpartition('=')
+    if not pattern:
+        raise argparse.ArgumentTypeError(f"格式应为 名字或通配符=比例: {text}")
+    return pattern, float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点函数基准测试和性能回归检查")
+    parser.add_argument("--output", metavar="FILE", help="把结果写入JSON文件")
+    parser.add_argument("--baseline", metavar="FILE", help="与基准结果比较")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写入基准文件")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="允许比基准慢的比例（默认0.25）")
+    parser.add_argument("--case-threshold", type=parse_override, action="append", default=[],
+                        metavar="PATTERN=RATIO", help="单独设置某些测试项的阈值，可用通配符，可重复")
+    parser.add_argument("--filter", default="*", help="只运行名字匹配的测试项（通配符）")
+    parser.add_argument("--users", default=USER_SIZES, help="用户数量，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    errors = verify_board_types()
+    for error in errors:
+        print(f"MISMATCH {error}")
+    if not errors:
+        print(f"verified: {', '.join(sorted(BOARD_TYPES))} boards give identical results")
+
+    cases, fixtures = build_cases([int(size) for size in args.users.split(',') if size])
+    results = {}
+    try:
+        for name, make, number in cases:
+            if not fnmatch.fnmatchcase(name, args.filter):
+                continue
+            results[name] = measure(make, number, args.repeat)
+            print(f"{name:<30}best {results[name]['best_us']:>12.3f} us  "
+                  f"median {results[name]['median_us']:>12.3f} us")
+    finally:
+        for fixture in fixtures:
+            fixture.close()
+
+    report = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    status = 1 if errors else 0
+    if args.baseline and not args.update_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline["results"], args.threshold, args.case_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            status = 1
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# 用户存储后端性能测试：在不同用户数量下测量启动加载、注册、登录、成绩更新和排名查询
+#
+#   python benchmarks/bench_users.py --sizes 1000,100000,1000000 --backends sqlite,json
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tetris_users import UserManager, open_user_store  # noqa: E402
+
+
+def make_users(count):
+    return {f"{i:05d}": {
+        "username": f"user{i}",
+        "password": "pw",
+        "highest_score": (i * 37) % 5000,
+        "lowest_score": 0,
+        "game_count": 1,
+        "last_played": "",
+    } for i in range(1, count + 1)}
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(backend, size, read_ops, write_ops):
+    directory = tempfile.mkdtemp(prefix="tetris_users_")
+    json_path = os.path.join(directory, "users.json")
+    db_path = os.path.join(directory, "users.db")
+    try:
+        store = open_user_store(backend, json_path, db_path)
+        store.save_all(make_users(size))
+        store.close()
+
+        start = time.perf_counter()
+        manager = UserManager(open_user_store(backend, json_path, db_path))
+        load_time = time.perf_counter() - start
+
+        rng = random.Random(size)
+        names = [f"user{rng.randint(1, size)}" for _ in range(read_ops)]
+        login = timed(lambda i: manager.login(names[i], "pw"), read_ops)
+        register = timed(lambda i: manager.register_user(f"new{i}", "pw"), write_ops)
+        update = timed(lambda i: manager.update_user_stats(i * 100), write_ops)
+        user_ids = [manager.username_index[name] for name in names]
+        rank = timed(lambda i: manager.get_rank(user_ids[i]), read_ops)
+        manager.close()
+        return load_time, login, register, update, rank
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用户存储后端性能测试")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--backends", default="sqlite,json")
+    parser.add_argument("--read-ops", type=int, default=200, help="登录测试次数")
+    parser.add_argument("--write-ops", type=int, default=20, help="注册和成绩更新测试次数")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8}{'users':>10}{'load ms':>12}{'login ms':>12}{'register ms':>14}"
+          f"{'update ms':>12}{'rank ms':>12}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        for backend in args.backends.split(','):
+            load_time, login, register, update, rank = bench(backend, size, args.read_ops, args.write_ops)
+            print(f"{backend:<8}{size:>10}{load_time * 1000:>12.1f}{login * 1000:>12.3f}"
+                  f"{register * 1000:>14.3f}{update * 1000:>12.3f}{rank * 1000:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 import pygame # type: ignore
-import random
-import os
+import argparse
 import json
+import os
 import sys
-from datetime import datetime
-
-# 初始化
-pygame.init()
+from collections import OrderedDict, deque
+from functools import lru_cache
+from tetris_ai import AutoPlayer
+from tetris_engine import TetrisEngine, LEFT, RIGHT, DOWN, ROTATE, TICK, HARD_DROP
+from tetris_pieces import COLORS
+from tetris_profiler import FrameProfiler
+from tetris_replay import FRAME_RATE, ReplayError, open_replay, record_replay
+from tetris_users import UserManager
 
 # 颜色定义
 BLACK = (0, 0, 0)
@@ -33,45 +37,201 @@ SCREEN_WIDTH = BLOCK_SIZE * GRID_WIDTH  # 恢复原来的宽度
 SCREEN_HEIGHT = BLOCK_SIZE * GRID_HEIGHT
 LOGIN_WIDTH = 500
 LOGIN_HEIGHT = 450  # 增加登录窗口高度，给提示信息留出更多空间
+BOARD_TYPE = 'auto'  # 棋盘实现：'auto' 按高度自动选择，'bit' 位棋盘，'ring' 环形缓冲区，'grid' 原二维列表
+PIECE_RANDOMIZER = 'uniform'  # 方块随机方式：'uniform' 等概率，'bag7' 七个一袋
+
+BLOCK_COLORKEY = (1, 2, 3)  # 方块贴图的透明色
+FRAME_TIME = 1000 // 60  # 毫秒，自动游戏和播放录像时每帧推进一次
+PROFILE_OVERLAY_INTERVAL = 15  # 性能叠加层每隔多少帧更新一次文字
+UNDO_LIMIT = 1000  # 最多可以撤销多少个方块
+# 窗口被遮挡后重新露出等情况需要整屏重绘
+REDRAW_EVENTS = tuple(getattr(pygame, name) for name in ('VIDEOEXPOSE', 'WINDOWEXPOSED', 'WINDOWRESTORED')
+                      if hasattr(pygame, name))
 
-# 方块形状
-SHAPES = [
-    [[1, 1, 1, 1]],  # I
-    [[1, 1], [1, 1]],  # O
-    [[1, 1, 1], [0, 1, 0]],  # T
-    [[1, 1, 1], [1, 0, 0]],  # L
-    [[1, 1, 1], [0, 0, 1]],  # J
-    [[1, 1, 0], [0, 1, 1]],  # S
-    [[0, 1, 1], [1, 1, 0]]   # Z
+# 缓存大小
+FONT_CACHE_SIZE = 32
+TEXT_CACHE_SIZE = 256
+
+# 按顺序尝试系统中可能存在的中文字体
+FONT_NAMES = [
+    'SimHei',  # 中文黑体
+    'Microsoft YaHei',  # 微软雅黑
+    'SimSun',  # 中文宋体
+    'NSimSun',  # 新宋体
+    'FangSong',  # 仿宋
+    'KaiTi',  # 楷体
+    'Arial Unicode MS'  # 通用字体
 ]
+# 查找系统字体要枚举所有已安装的字体，可能需要几百毫秒，
+# 所以把找到的字体文件路径保存下来，之后启动直接打开该文件。
+# 字体列表变化或文件不存在时自动重新查找，也可以用 --refresh-fonts 强制重新查找。
+FONT_PATH_CACHE = "tetris_fonts.json"
+FONT_PATH_CACHE_VERSION = 2  # 2: 改为由 SysFont 选择字体
+
+font_paths = None  # {'regular'/'bold': [字体文件路径或None, 是否需要模拟粗体]}
+
+def init_display():
+    # 只初始化用到的显示和字体子系统（不启动音频等），第一次打开窗口时调用
+    if not pygame.display.get_init():
+        pygame.display.init()
+        pygame.time.wait(0)  # 顺带初始化计时器，get_ticks 才会从0开始计时
+    if not pygame.font.get_init():
+        pygame.font.init()
+
+def load_font_paths(path=FONT_PATH_CACHE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # 文件内容不是预期的结构（被手工改坏等）时当作没有缓存
+    if not isinstance(data, dict):
+        return {}
+    if data.get("version") != FONT_PATH_CACHE_VERSION or data.get("names") != FONT_NAMES:
+        return {}
+    entries = data.get("fonts")
+    if not isinstance(entries, dict):
+        return {}
+    for key, entry in entries.items():
+        if key not in ('regular', 'bold') or not isinstance(entry, list) or len(entry) != 2:
+            return {}
+        font_path, synthetic_bold = entry
+        if not isinstance(synthetic_bold, bool):
+            return {}
+        if font_path is not None and not (isinstance(font_path, str) and os.path.exists(font_path)):
+            return {}
+    return entries
 
-COLORS = [CYAN, YELLOW, MAGENTA, ORANGE, BLUE, GREEN, RED]
+def save_font_paths(entries, path=FONT_PATH_CACHE):
+    data = {"version": FONT_PATH_CACHE_VERSION, "names": FONT_NAMES, "fonts": entries}
+    try:
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(temp_path, path)
+    except OSError:
+        pass  # 缓存写不进去只影响下次启动的速度
 
-# 用户数据文件
-USER_DATA_FILE = "tetris_users.json"
+def clear_font_cache(path=FONT_PATH_CACHE):
+    # 删除保存的字体路径，下次使用字体时重新查找
+    global font_paths
+    font_paths = None
+    get_font.cache_clear()
+    text_cache.clear()
+    if os.path.exists(path):
+        os.remove(path)
 
-# 获取支持中文的字体
+def resolve_font(bold=False):
+    # 返回 (字体文件路径, 是否需要模拟粗体)；路径为None表示使用pygame默认字体
+    global font_paths
+    if font_paths is None:
+        font_paths = load_font_paths()
+    key = 'bold' if bold else 'regular'
+    if key not in font_paths:
+        # 字体由 SysFont 按 FONT_NAMES 的顺序选择（包括别名和粗体的处理），
+        # 这里只借用它的 constructor 参数记下选中的文件和是否模拟粗体
+        entry = []
+        def capture(font_path, size, set_bold, set_italic):
+            entry[:] = [font_path, set_bold]
+        pygame.font.SysFont(FONT_NAMES, 0, bold=bold, constructor=capture)
+        font_paths[key] = entry
+        save_font_paths(font_paths)
+    return tuple(font_paths[key])
+
+# 获取支持中文的字体（按 (大小, 粗体) 缓存，命中统计见 get_font.cache_info()）
+@lru_cache(maxsize=FONT_CACHE_SIZE)
 def get_font(size, bold=False):
-    # 尝试使用系统中可能存在的中文字体
-    font_names = [
-        'SimHei',  # 中文黑体
-        'Microsoft YaHei',  # 微软雅黑
-        'SimSun',  # 中文宋体
-        'NSimSun',  # 新宋体
-        'FangSong',  # 仿宋
-        'KaiTi',  # 楷体
-        'Arial Unicode MS'  # 通用字体
-    ]
-    
-    # 尝试加载系统字体
-    for font_name in font_names:
-        try:
-            return pygame.font.SysFont(font_name, size, bold=bold)
-        except:
-            continue
-    
-    # 如果没有找到合适的系统字体，使用默认字体
-    return pygame.font.Font(None, size)
+    if not pygame.font.get_init():
+        pygame.font.init()
+    font_path, synthetic_bold = resolve_font(bold)
+    font = pygame.font.Font(font_path, size)
+    if synthetic_bold:
+        font.set_bold(True)
+    return font
+
+class BlockAtlas:
+    # 预渲染的方块贴图：每种颜色在每个缩放比例下一张
+    def __init__(self, block_size, scales=(1.0, 0.6)):
+        self.block_size = block_size
+        self.sprites = {}
+        for scale in scales:
+            size = int(block_size * scale)
+            self.sprites[scale] = [self.render_block(color, size) for color in COLORS]
+        # 落点预览用的空心方块
+        self.ghosts = [self.render_ghost(color, block_size) for color in COLORS]
+
+    @staticmethod
+    def render_block(color, size):
+        # 与原来的绘制方式相同：方块本体加左边和上边的白色高光，
+        # 右边和下边留一像素透明的缝
+        surface = pygame.Surface((size, size)).convert()
+        surface.fill(BLOCK_COLORKEY)
+        surface.set_colorkey(BLOCK_COLORKEY, pygame.RLEACCEL)
+        pygame.draw.rect(surface, color, (0, 0, size - 1, size - 1))
+        pygame.draw.line(surface, WHITE, (0, 0), (0, size - 1), 1)
+        pygame.draw.line(surface, WHITE, (0, 0), (size - 1, 0), 1)
+        return surface
+
+    @staticmethod
+    def render_ghost(color, size):
+        surface = pygame.Surface((size, size)).convert()
+        surface.fill(BLOCK_COLORKEY)
+        surface.set_colorkey(BLOCK_COLORKEY, pygame.RLEACCEL)
+        pygame.draw.rect(surface, color, (0, 0, size - 1, size - 1), 1)
+        return surface
+
+class TextCache:
+    # 渲染好的文字缓存，按 (文字, 字体, 颜色) 做LRU淘汰
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (text, font, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+text_cache = TextCache()
+
+def render_text(font, text, color):
+    # 只有文字内容、字体或颜色变化时才重新渲染
+    return text_cache.render(font, text, color)
+
+def cache_stats():
+    font_info = get_font.cache_info()
+    return {
+        "font_hits": font_info.hits,
+        "font_misses": font_info.misses,
+        "text_hits": text_cache.hits,
+        "text_misses": text_cache.misses,
+    }
+
+def wait_events(timeout=None):
+    # 阻塞等待第一个事件（timeout为毫秒，None表示一直等），再取出队列中剩下的事件
+    # 空闲时进程睡眠在事件等待上，不再每帧轮询和重绘
+    if timeout is None:
+        event = pygame.event.wait()
+    elif timeout > 0:
+        event = pygame.event.wait(timeout)
+    else:
+        return pygame.event.get()
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
 
 class InputBox:
     def __init__(self, x, y, w, h, text=''):
@@ -119,7 +279,7 @@ class InputBox:
         pygame.draw.rect(screen, self.color, self.rect, 2)
         # 绘制文本
         display_text = '*' * len(self.text) if self.password else self.text
-        self.txt_surface = self.font.render(display_text, True, WHITE)
+        self.txt_surface = render_text(self.font, display_text, WHITE)
         screen.blit(self.txt_surface, (self.rect.x+5, self.rect.y+5))
 
 class Button:
@@ -128,7 +288,7 @@ class Button:
         self.color = color
         self.text = text
         self.font = get_font(24)
-        self.txt_surface = self.font.render(text, True, WHITE)
+        self.txt_surface = render_text(self.font, text, WHITE)
 
     def draw(self, screen):
         # 绘制按钮
@@ -140,101 +300,9 @@ class Button:
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
 
-class UserManager:
-    def __init__(self):
-        self.users = {}
-        self.current_user = None
-        self.load_users()
-
-    def load_users(self):
-        if os.path.exists(USER_DATA_FILE):
-            try:
-                with open(USER_DATA_FILE, 'r', encoding='utf-8') as f:
-                    self.users = json.load(f)
-            except:
-                self.users = {}
-        else:
-            self.users = {}
-
-    def save_users(self):
-        with open(USER_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.users, f, ensure_ascii=False, indent=4)
-    
-    def generate_user_id(self):
-        # 生成新的用户ID，从00001开始累加
-        if not self.users:
-            return "00001"
-        
-        # 找到当前最大的用户ID
-        max_id = 0
-        for user_id in self.users.keys():
-            try:
-                id_num = int(user_id)
-                if id_num > max_id:
-                    max_id = id_num
-            except ValueError:
-                continue
-        
-        # 返回下一个ID
-        return f"{max_id + 1:05d}"
-
-    def register_user(self, username, password):
-        # 检查用户名是否已存在
-        for user_id, user_data in self.users.items():
-            if user_data.get("username") == username:
-                return False, "用户名已存在"
-                
-        # 生成新的用户ID
-        user_id = self.generate_user_id()
-        
-        self.users[user_id] = {
-            "username": username,
-            "password": password,
-            "highest_score": 0,
-            "lowest_score": 0,
-            "game_count": 0,
-            "last_played": ""
-        }
-        self.save_users()
-        return True, f"注册成功，您的用户名是: {username}"
-
-    def login(self, username, password):
-        # 通过用户名查找用户
-        user_id = None
-        for uid, user_data in self.users.items():
-            if user_data.get("username") == username:
-                user_id = uid
-                break
-                
-        if user_id is None:
-            return False, "用户不存在"
-        
-        if self.users[user_id]["password"] != password:
-            return False, "密码错误"
-        
-        self.current_user = user_id
-        return True, "登录成功"
-
-    def update_user_stats(self, score):
-        if not self.current_user:
-            return
-        
-        user = self.users[self.current_user]
-        user["game_count"] += 1
-        user["last_played"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # 更新最高分
-        if score > user["highest_score"]:
-            user["highest_score"] = score
-        
-        # 更新最低分（如果是第一次玩或者当前分数低于最低分）
-        if user["lowest_score"] == 0 or score < user["lowest_score"]:
-            user["lowest_score"] = score
-        
-        self.save_users()
-
 class LoginScreen:
     def __init__(self, user_manager):
+        init_display()
         self.screen = pygame.display.set_mode((LOGIN_WIDTH, LOGIN_HEIGHT))
         pygame.display.set_caption("俄罗斯方块 - 登录")
         self.clock = pygame.time.Clock()
@@ -254,11 +322,17 @@ class LoginScreen:
         self.is_registering = False
 
     def run(self):
-        running = True
-        while running:
-            for event in pygame.event.get():
+        # 只在有输入之后重绘，没有输入时阻塞等待
+        dirty = True
+        while True:
+            if dirty:
+                self.draw()
+                dirty = False
+            for event in wait_events():
                 if event.type == pygame.QUIT:
                     return None
+                if event.type != pygame.MOUSEMOTION:
+                    dirty = True
                 
                 # 处理输入 - 确保两个输入框都能接收事件
                 username_entered = self.username_input.handle_event(event)
@@ -307,9 +381,9 @@ class LoginScreen:
                             self.message = ""
                             # 清空输入框
                             self.username_input.text = ""
-                            self.username_input.txt_surface = self.username_input.font.render("", True, WHITE)
+                            self.username_input.txt_surface = render_text(self.username_input.font, "", WHITE)
                             self.password_input.text = ""
-                            self.password_input.txt_surface = self.password_input.font.render("", True, WHITE)
+                            self.password_input.txt_surface = render_text(self.password_input.font, "", WHITE)
                     
                     elif self.register_button.is_clicked(event.pos):
                         if self.is_registering:
@@ -334,167 +408,205 @@ class LoginScreen:
                             self.message_color = WHITE
                             # 清空输入框
                             self.username_input.text = ""
-                            self.username_input.txt_surface = self.username_input.font.render("", True, WHITE)
+                            self.username_input.txt_surface = render_text(self.username_input.font, "", WHITE)
                             self.password_input.text = ""
-                            self.password_input.txt_surface = self.password_input.font.render("", True, WHITE)
-            
-            # 更新输入框
-            self.username_input.update()
-            self.password_input.update()
-            
-            self.screen.fill(BLACK)
-            
-            # 绘制标题
-            font = get_font(32)
-            title = "注册新用户" if self.is_registering else "用户登录"
-            title_surface = font.render(title, True, WHITE)
-            self.screen.blit(title_surface, (LOGIN_WIDTH // 2 - title_surface.get_width() // 2, 30))
-            
-            # 绘制提示消息 - 移到标题下方，增加间距
-            if self.message:
-                # 如果消息太长，分行显示
-                words = self.message.split()
-                lines = []
-                current_line = ""
-                label_font = get_font(24)
-                
-                for word in words:
-                    test_line = current_line + word + " "
-                    if label_font.size(test_line)[0] < LOGIN_WIDTH - 60:
-                        current_line = test_line
-                    else:
-                        lines.append(current_line)
-                        current_line = word + " "
-                
-                if current_line:
-                    lines.append(current_line)
-                
-                # 绘制每一行 - 在标题下方显示，增加垂直间距
-                for i, line in enumerate(lines):
-                    message_surface = label_font.render(line, True, self.message_color)
-                    message_rect = message_surface.get_rect(center=(LOGIN_WIDTH // 2, 90 + i * 30))
-                    self.screen.blit(message_surface, message_rect)
-            
-            # 绘制标签和输入框
+                            self.password_input.txt_surface = render_text(self.password_input.font, "", WHITE)
+
+    def draw(self):
+        # 更新输入框
+        self.username_input.update()
+        self.password_input.update()
+        
+        self.screen.fill(BLACK)
+        
+        # 绘制标题
+        font = get_font(32)
+        title = "注册新用户" if self.is_registering else "用户登录"
+        title_surface = render_text(font, title, WHITE)
+        self.screen.blit(title_surface, (LOGIN_WIDTH // 2 - title_surface.get_width() // 2, 30))
+        
+        # 绘制提示消息 - 移到标题下方，增加间距
+        if self.message:
+            # 如果消息太长，分行显示
+            words = self.message.split()
+            lines = []
+            current_line = ""
             label_font = get_font(24)
             
-            # 显示用户名和密码字段
-            username_label = label_font.render("用户名:", True, WHITE)
-            username_label_rect = username_label.get_rect(right=170, centery=166)
-            self.screen.blit(username_label, username_label_rect)
-            self.username_input.draw(self.screen)
-            
-            password_label = label_font.render("密码:", True, WHITE)
-            password_label_rect = password_label.get_rect(right=170, centery=246)
-            self.screen.blit(password_label, password_label_rect)
-            self.password_input.draw(self.screen)
-            
-            # 调整按钮位置
-            self.login_button.rect.y = 350
-            self.register_button.rect.y = 350
-            
-            # 更新按钮文本
-            login_text = "返回登录" if self.is_registering else "登录"
-            self.login_button.text = login_text
-            self.login_button.txt_surface = self.login_button.font.render(login_text, True, WHITE)
-            
-            register_text = "确认注册" if self.is_registering else "注册"
-            self.register_button.text = register_text
-            self.register_button.txt_surface = self.register_button.font.render(register_text, True, WHITE)
+            for word in words:
+                test_line = current_line + word + " "
+                if label_font.size(test_line)[0] < LOGIN_WIDTH - 60:
+                    current_line = test_line
+                else:
+                    lines.append(current_line)
+                    current_line = word + " "
             
-            # 绘制按钮
-            self.login_button.draw(self.screen)
-            self.register_button.draw(self.screen)
+            if current_line:
+                lines.append(current_line)
             
-            pygame.display.flip()
-            self.clock.tick(30)
+            # 绘制每一行 - 在标题下方显示，增加垂直间距
+            for i, line in enumerate(lines):
+                message_surface = render_text(label_font, line, self.message_color)
+                message_rect = message_surface.get_rect(center=(LOGIN_WIDTH // 2, 90 + i * 30))
+                self.screen.blit(message_surface, message_rect)
+        
+        # 绘制标签和输入框
+        label_font = get_font(24)
+        
+        # 显示用户名和密码字段
+        username_label = render_text(label_font, "用户名:", WHITE)
+        username_label_rect = username_label.get_rect(right=170, centery=166)
+        self.screen.blit(username_label, username_label_rect)
+        self.username_input.draw(self.screen)
+        
+        password_label = render_text(label_font, "密码:", WHITE)
+        password_label_rect = password_label.get_rect(right=170, centery=246)
+        self.screen.blit(password_label, password_label_rect)
+        self.password_input.draw(self.screen)
+        
+        # 调整按钮位置
+        self.login_button.rect.y = 350
+        self.register_button.rect.y = 350
+        
+        # 更新按钮文本
+        login_text = "返回登录" if self.is_registering else "登录"
+        self.login_button.text = login_text
+        self.login_button.txt_surface = render_text(self.login_button.font, login_text, WHITE)
+        
+        register_text = "确认注册" if self.is_registering else "注册"
+        self.register_button.text = register_text
+        self.register_button.txt_surface = render_text(self.register_button.font, register_text, WHITE)
         
-        return None
+        # 绘制按钮
+        self.login_button.draw(self.screen)
+        self.register_button.draw(self.screen)
+        
+        pygame.display.flip()
 
 class Tetris:
-    def __init__(self, user_manager, user_id):
+    def __init__(self, user_manager, user_id, record_path=None, replay=None, replay_speed=1.0, profiler=None):
+        init_display()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("俄罗斯方块")
         self.clock = pygame.time.Clock()
-        self.grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-        self.current_piece = self.new_piece()
-        self.next_piece = self.new_piece()  # 添加下一个方块
-        self.game_over = False
-        self.score = 0
+        # 游戏规则全部在引擎中，这里只负责输入、计时和绘制
+        if replay:
+            if (replay.width, replay.height) != (GRID_WIDTH, GRID_HEIGHT):
+                raise ReplayError(f"录像的棋盘大小 {replay.width}x{replay.height} 与当前设置不同")
+            self.engine = replay.make_engine(BOARD_TYPE)
+        else:
+            self.engine = TetrisEngine(GRID_WIDTH, GRID_HEIGHT, BOARD_TYPE, randomizer=PIECE_RANDOMIZER)
         self.user_manager = user_manager
         self.user_id = user_id
         self.last_fall_time = pygame.time.get_ticks()  # 使用精确的时间控制
+        # 录像：record_path 不为空时记录每一局，replay 不为空时播放录像
+        self.record_path = record_path
+        self.recorder = None
+        self.games_recorded = 0
+        self.replay = replay
+        self.replay_speed = replay_speed
+        self.start_time = self.last_fall_time
+        # 静态背景（底色、虚线网格）和信息面板底板只渲染一次，每帧直接贴图
+        self.background = None
+        self.info_panel = None
+        self.background_key = None
+        self.atlas = None
+        # 自动玩家：按A键开关，每帧执行一个动作
+        self.autoplayer = None
+        # 本局用过自动玩家或撤销时为True，这样的一局不计入成绩和排行榜
+        self.assisted = False
+        # 局部刷新：方块移动时只把方块和落点预览所在的区域提交到窗口，
+        # 锁定方块（棋盘、分数、下一个方块都可能变化）或需要整屏重绘时才整屏刷新
+        self.full_redraw = True
+        self.drawn_pieces = None
+        self.dirty_rects = []
+        # 每帧耗时统计：按F3显示叠加层；没有开启时为None，计时点只做一次判断
+        self.profiler = profiler
+        self.show_profile = False
+        self.profile_surface = None
+        self.profile_frame = 0
+        # 撤销：每个方块出现时保存一个引擎快照，按Z键回到上一个方块出现时
+        self.undo_history = deque(maxlen=UNDO_LIMIT)
         
-    def new_piece(self):
-        shape = random.choice(SHAPES)
-        color = COLORS[SHAPES.index(shape)]
-        x = GRID_WIDTH // 2 - len(shape[0]) // 2
-        y = 0
-        return {'shape': shape, 'x': x, 'y': y, 'color': color}
+    @property
+    def board(self):
+        return self.engine.board
     
-    def valid_move(self, piece, x, y):
-        for i in range(len(piece['shape'])):
-            for j in range(len(piece['shape'][0])):
-                if piece['shape'][i][j]:
-                    if (x + j < 0 or x + j >= GRID_WIDTH or
-                        y + i >= GRID_HEIGHT or
-                        (y + i >= 0 and self.grid[y + i][x + j])):
-                        return False
-        return True
+    @property
+    def current_piece(self):
+        return self.engine.current_piece
     
-    def merge_piece(self):
-        for i in range(len(self.current_piece['shape'])):
-            for j in range(len(self.current_piece['shape'][0])):
-                if self.current_piece['shape'][i][j]:
-                    self.grid[self.current_piece['y'] + i][self.current_piece['x'] + j] = self.current_piece['color']
+    @property
+    def next_piece(self):
+        return self.engine.next_piece
     
-    def clear_lines(self):
-        lines_cleared = 0
-        i = GRID_HEIGHT - 1
-        while i >= 0:
-            if all(self.grid[i]):
-                del self.grid[i]
-                self.grid.insert(0, [0 for _ in range(GRID_WIDTH)])
-                lines_cleared += 1
-            else:
-                i -= 1
-        self.score += lines_cleared * 100
+    @property
+    def score(self):
+        return self.engine.score
     
-    def draw_grid_lines(self):
+    @property
+    def game_over(self):
+        return self.engine.game_over
+    
+    def draw_grid_lines(self, surface):
         # 绘制虚线网格
         for i in range(GRID_HEIGHT + 1):
             # 绘制水平虚线
             for x in range(0, GRID_WIDTH * BLOCK_SIZE, 5):  # 每5像素绘制一个点
-                pygame.draw.line(self.screen, LIGHT_GRAY, 
+                pygame.draw.line(surface, LIGHT_GRAY, 
                                (x, i * BLOCK_SIZE), 
                                (x + 2, i * BLOCK_SIZE), 1)
         
         for j in range(GRID_WIDTH + 1):
             # 绘制垂直虚线
             for y in range(0, GRID_HEIGHT * BLOCK_SIZE, 5):  # 每5像素绘制一个点
-                pygame.draw.line(self.screen, LIGHT_GRAY, 
+                pygame.draw.line(surface, LIGHT_GRAY, 
                                (j * BLOCK_SIZE, y), 
                                (j * BLOCK_SIZE, y + 2), 1)
     
+    def build_background(self):
+        # 只有棋盘大小或方块尺寸变化时才重新渲染背景
+        key = (GRID_WIDTH, GRID_HEIGHT, BLOCK_SIZE)
+        if self.background is not None and self.background_key == key:
+            return
+        width = GRID_WIDTH * BLOCK_SIZE
+        self.background = pygame.Surface((width, GRID_HEIGHT * BLOCK_SIZE)).convert()
+        self.background.fill(BLACK)
+        self.draw_grid_lines(self.background)
+        
+        # 信息面板底板：深灰色背景加蓝色边框
+        self.info_panel = pygame.Surface((width, 110)).convert()
+        self.info_panel.fill((30, 30, 30))
+        pygame.draw.rect(self.info_panel, BLUE, self.info_panel.get_rect(), 1)
+        
+        # 方块贴图：棋盘用1.0倍，预览用0.6倍
+        self.atlas = BlockAtlas(BLOCK_SIZE)
+        self.background_key = key
+    
     def draw_piece(self, piece, offset_x=0, offset_y=0, scale=1.0):
         # 绘制方块（可用于主游戏区和预览区）
-        for i in range(len(piece['shape'])):
-            for j in range(len(piece['shape'][0])):
-                if piece['shape'][i][j]:
-                    color = piece['color']
-                    x = (piece['x'] + j) * BLOCK_SIZE * scale + offset_x
-                    y = (piece['y'] + i) * BLOCK_SIZE * scale + offset_y
-                    block_size = int(BLOCK_SIZE * scale)
-                    
-                    pygame.draw.rect(self.screen, color,
-                                  (x, y, block_size - 1, block_size - 1))
-                    # 添加高光效果
-                    pygame.draw.line(self.screen, WHITE, 
-                                   (x, y), 
-                                   (x, y + block_size - 1), 1)
-                    pygame.draw.line(self.screen, WHITE, 
-                                   (x, y), 
-                                   (x + block_size - 1, y), 1)
+        sprite = self.atlas.sprites[scale][piece.kind]
+        step = BLOCK_SIZE * scale
+        self.screen.blits([(sprite, (int((piece.x + j) * step + offset_x), int((piece.y + i) * step + offset_y)))
+                           for i, j in piece.state.cells], False)
+    
+    def piece_rects(self):
+        # 当前方块和落点预览在屏幕上占据的区域
+        piece = self.current_piece
+        state = piece.state
+        size = (state.width * BLOCK_SIZE, state.height * BLOCK_SIZE)
+        return [pygame.Rect((piece.x * BLOCK_SIZE, piece.y * BLOCK_SIZE), size),
+                pygame.Rect((piece.x * BLOCK_SIZE, self.engine.landing_y(piece) * BLOCK_SIZE), size)]
+    
+    def draw_ghost_piece(self):
+        # 在当前方块直接落到底的位置画出空心轮廓
+        piece = self.current_piece
+        ghost_y = self.engine.landing_y(piece)
+        if ghost_y <= piece.y:
+            return
+        sprite = self.atlas.ghosts[piece.kind]
+        self.screen.blits([(sprite, ((piece.x + j) * BLOCK_SIZE, (ghost_y + i) * BLOCK_SIZE))
+                           for i, j in piece.state.cells], False)
     
     def draw_next_piece_preview(self):
         # 绘制下一个方块预览区域 - 放在信息面板中
@@ -503,13 +615,14 @@ class Tetris:
         preview_size = 80  # 预览区域大小
         
         # 计算预览方块的位置
-        shape_width = len(self.next_piece['shape'][0]) * (BLOCK_SIZE * 0.6)  # 缩小比例
-        shape_height = len(self.next_piece['shape']) * (BLOCK_SIZE * 0.6)
+        state = self.next_piece.state
+        shape_width = state.width * (BLOCK_SIZE * 0.6)  # 缩小比例
+        shape_height = state.height * (BLOCK_SIZE * 0.6)
         
         # 居中显示预览方块
         preview_piece = self.next_piece.copy()
-        preview_piece['x'] = 0
-        preview_piece['y'] = 0
+        preview_piece.x = 0
+        preview_piece.y = 0
         
         # 绘制预览方块 - 使用缩小的比例
         center_x = preview_x + (preview_size - shape_width) / 2
@@ -517,35 +630,22 @@ class Tetris:
         self.draw_piece(preview_piece, center_x, center_y, 0.6)  # 缩小为原来的60%
     
     def draw(self):
-        self.screen.fill(BLACK)
+        # 绘制缓存的背景（底色和虚线网格）
+        self.build_background()
+        self.screen.blit(self.background, (0, 0))
         
-        # 绘制虚线网格
-        self.draw_grid_lines()
-        
-        # 绘制网格
-        for i in range(GRID_HEIGHT):
-            for j in range(GRID_WIDTH):
-                if self.grid[i][j]:
-                    # 添加3D效果
-                    color = self.grid[i][j]
-                    pygame.draw.rect(self.screen, color,
-                                  (j * BLOCK_SIZE, i * BLOCK_SIZE, BLOCK_SIZE - 1, BLOCK_SIZE - 1))
-                    # 添加高光效果
-                    pygame.draw.line(self.screen, WHITE, 
-                                   (j * BLOCK_SIZE, i * BLOCK_SIZE), 
-                                   (j * BLOCK_SIZE, (i+1) * BLOCK_SIZE - 1), 1)
-                    pygame.draw.line(self.screen, WHITE, 
-                                   (j * BLOCK_SIZE, i * BLOCK_SIZE), 
-                                   ((j+1) * BLOCK_SIZE - 1, i * BLOCK_SIZE), 1)
-        
-        # 绘制当前方块
+        # 绘制网格 - 所有已落下的方块用一次批量贴图完成
+        sprites = self.atlas.sprites[1.0]
+        self.screen.blits([(sprites[code - 1], (j * BLOCK_SIZE, i * BLOCK_SIZE))
+                           for i, j, code in self.board.occupied_cells()], False)
+        
+        # 绘制落点预览和当前方块
         if self.current_piece:
+            self.draw_ghost_piece()
             self.draw_piece(self.current_piece)
         
-        # 创建信息面板背景
-        info_panel = pygame.Rect(0, 0, SCREEN_WIDTH, 110)
-        pygame.draw.rect(self.screen, (30, 30, 30), info_panel)  # 深灰色背景
-        pygame.draw.rect(self.screen, BLUE, info_panel, 1)  # 蓝色边框，减小宽度
+        # 信息面板背景
+        self.screen.blit(self.info_panel, (0, 0))
         
         # 使用更小的字体
         title_font = get_font(18)  # 标题字体
@@ -558,24 +658,24 @@ class Tetris:
             user_info = self.user_manager.users[self.user_id]
             
             # 玩家标签 - 使用白色粗体
-            player_label = bold_font.render("玩家:", True, WHITE)
+            player_label = render_text(bold_font, "玩家:", WHITE)
             player_label_rect = player_label.get_rect(topleft=(15, 15))
             self.screen.blit(player_label, player_label_rect)
             
             # 玩家名称 - 使用红色粗体
-            player_name = bold_font.render(f'{user_info["username"]}', True, BRIGHT_RED)
+            player_name = render_text(bold_font, f'{user_info["username"]}', BRIGHT_RED)
             player_name_rect = player_name.get_rect(left=player_label_rect.right + 5, top=15)
             self.screen.blit(player_name, player_name_rect)
             
             # 当前分数标签 - 使用白色粗体，放在右边
-            score_label = bold_font.render("当前分数:", True, WHITE)
+            score_label = render_text(bold_font, "当前分数:", WHITE)
             score_label_rect = score_label.get_rect()
             score_label_rect.right = SCREEN_WIDTH - 80  # 向左移动一小部分，不要太靠边
             score_label_rect.top = 15
             self.screen.blit(score_label, score_label_rect)
             
             # 当前分数值 - 使用红色粗体
-            score_value = bold_font.render(f'{self.score}', True, BRIGHT_RED)
+            score_value = render_text(bold_font, f'{self.score}', BRIGHT_RED)
             score_value_rect = score_value.get_rect()
             score_value_rect.left = score_label_rect.right + 5
             score_value_rect.top = 15
@@ -585,34 +685,34 @@ class Tetris:
             self.draw_next_piece_preview()
             
             # 最高分标签 - 使用白色粗体
-            high_score_label = bold_info_font.render("最高分:", True, WHITE)
+            high_score_label = render_text(bold_info_font, "最高分:", WHITE)
             high_score_label_rect = high_score_label.get_rect(topleft=(15, 45))
             self.screen.blit(high_score_label, high_score_label_rect)
             
             # 最高分值 - 使用红色粗体
             high_score = user_info["highest_score"]
-            high_score_value = bold_info_font.render(f'{high_score}', True, BRIGHT_RED)
+            high_score_value = render_text(bold_info_font, f'{high_score}', BRIGHT_RED)
             high_score_value_rect = high_score_value.get_rect(left=high_score_label_rect.right + 5, top=45)
             self.screen.blit(high_score_value, high_score_value_rect)
             
             # 最低分标签 - 使用白色粗体
-            low_score_label = bold_info_font.render("最低分:", True, WHITE)
+            low_score_label = render_text(bold_info_font, "最低分:", WHITE)
             low_score_label_rect = low_score_label.get_rect(topleft=(15, 65))
             self.screen.blit(low_score_label, low_score_label_rect)
             
             # 最低分值 - 使用红色粗体
             low_score = user_info["lowest_score"] if user_info["lowest_score"] > 0 else 0
-            low_score_value = bold_info_font.render(f'{low_score}', True, BRIGHT_RED)
+            low_score_value = render_text(bold_info_font, f'{low_score}', BRIGHT_RED)
             low_score_value_rect = low_score_value.get_rect(left=low_score_label_rect.right + 5, top=65)
             self.screen.blit(low_score_value, low_score_value_rect)
             
             # 游戏次数标签 - 使用白色粗体
-            game_count_label = bold_info_font.render("游戏次数:", True, WHITE)
+            game_count_label = render_text(bold_info_font, "游戏次数:", WHITE)
             game_count_label_rect = game_count_label.get_rect(topleft=(15, 85))
             self.screen.blit(game_count_label, game_count_label_rect)
             
             # 游戏次数值 - 使用红色粗体
-            game_count_value = bold_info_font.render(f'{user_info["game_count"]}', True, BRIGHT_RED)
+            game_count_value = render_text(bold_info_font, f'{user_info["game_count"]}', BRIGHT_RED)
             game_count_value_rect = game_count_value.get_rect(left=game_count_label_rect.right + 5, top=85)
             self.screen.blit(game_count_value, game_count_value_rect)
             
@@ -630,79 +730,230 @@ class Tetris:
                     formatted_time = f"{date_parts} {hour}:{minute}"
                     
                     # 上次游戏标签 - 使用白色粗体
-                    last_played_label = bold_info_font.render("上次:", True, WHITE)
+                    last_played_label = render_text(bold_info_font, "上次:", WHITE)
                     last_played_label_rect = last_played_label.get_rect(left=game_count_label_rect.right + 40, top=85)  # 向左移动
                     self.screen.blit(last_played_label, last_played_label_rect)
                     
                     # 上次游戏时间值 - 使用红色普通字体（非粗体）
-                    last_played_value = info_font.render(formatted_time, True, BRIGHT_RED)
+                    last_played_value = render_text(info_font, formatted_time, BRIGHT_RED)
                     last_played_value_rect = last_played_value.get_rect(left=last_played_label_rect.right + 5, top=85)
                     self.screen.blit(last_played_value, last_played_value_rect)
                 except:
                     # 如果时间格式解析失败，显示原始时间
-                    last_played_label = bold_info_font.render("上次:", True, WHITE)
+                    last_played_label = render_text(bold_info_font, "上次:", WHITE)
                     last_played_label_rect = last_played_label.get_rect(left=game_count_label_rect.right + 40, top=85)  # 向左移动
                     self.screen.blit(last_played_label, last_played_label_rect)
                     
-                    last_played_value = info_font.render(user_info["last_played"], True, BRIGHT_RED)
+                    last_played_value = render_text(info_font, user_info["last_played"], BRIGHT_RED)
                     last_played_value_rect = last_played_value.get_rect(left=last_played_label_rect.right + 5, top=85)
                     self.screen.blit(last_played_value, last_played_value_rect)
         
-        pygame.display.flip()
+        rects = self.piece_rects()
+        if self.show_profile:
+            rects.append(self.draw_profile_overlay())
+        profiler = self.profiler
+        if profiler:
+            profiler.lap('draw')
+        if self.full_redraw or self.engine.pieces != self.drawn_pieces:
+            pygame.display.flip()
+        else:
+            # 旧位置也要提交，才能擦掉上一帧的方块
+            pygame.display.update(self.dirty_rects + rects)
+        self.dirty_rects = rects
+        self.drawn_pieces = self.engine.pieces
+        self.full_redraw = False
+        if profiler:
+            profiler.lap('present')
+            profiler.end_frame()
+    
+    def draw_profile_overlay(self):
+        # 左下角显示各段耗时的百分位数和掉帧数，文字每隔几帧才重新渲染
+        profiler = self.profiler
+        if self.profile_surface is None or profiler.frames - self.profile_frame >= PROFILE_OVERLAY_INTERVAL:
+            font = get_font(14)
+            lines = [font.render(line, True, WHITE) for line in profiler.report_lines()]
+            width = max(line.get_width() for line in lines) + 10
+            height = sum(line.get_height() for line in lines) + 10
+            self.profile_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+            self.profile_surface.fill((0, 0, 0, 180))
+            y = 5
+            for line in lines:
+                self.profile_surface.blit(line, (5, y))
+                y += line.get_height()
+            self.profile_frame = profiler.frames
+        rect = self.profile_surface.get_rect(bottomleft=(0, SCREEN_HEIGHT))
+        self.screen.blit(self.profile_surface, rect)
+        return rect
+    
+    def toggle_profile(self):
+        self.show_profile = not self.show_profile
+        self.profile_surface = None
+        if self.show_profile and self.profiler is None:
+            self.profiler = FrameProfiler()
+        elif not self.show_profile and self.profiler and not self.profiler.csv_writer:
+            self.profiler = None  # 只为叠加层创建的统计随叠加层关闭
+        self.full_redraw = True
+    
+    def apply(self, action):
+        # 所有输入都经过这里交给引擎，录像时同时写入录像文件
+        if self.recorder:
+            frame = (pygame.time.get_ticks() - self.start_time) * FRAME_RATE // 1000
+            self.recorder.record(frame, action)
+        pieces = self.engine.pieces
+        changed = self.engine.step(action)
+        if self.engine.pieces != pieces and not self.engine.game_over:
+            self.undo_history.append(self.engine.snapshot())
+        return changed
+    
+    def undo(self):
+        # 录像中没有撤销这个动作，录像时不能撤销
+        if self.recorder or len(self.undo_history) < 2:
+            return False
+        self.undo_history.pop()
+        self.engine.restore(self.undo_history[-1])
+        self.assisted = True
+        if self.autoplayer:
+            self.autoplayer.reset()
+        self.full_redraw = True
+        return True
+    
+    def record_result(self):
+        # 更新用户统计信息；用过自动玩家或撤销的一局不计入
+        if self.user_id and not self.assisted:
+            self.user_manager.update_user_stats(self.score)
+    
+    def start_recording(self):
+        if not self.record_path:
+            return
+        # 第一局使用指定的文件名，之后的每局在文件名后加上序号
+        self.games_recorded += 1
+        path = self.record_path
+        if self.games_recorded > 1:
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}-{self.games_recorded}{ext}"
+        try:
+            self.recorder = record_replay(path, self.engine)
+        except (OSError, ReplayError) as e:
+            # 录不了也照常游戏，只是这一局没有录像
+            print(f"无法录像 {path}: {e}", file=sys.stderr)
+    
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
     
     def run(self):
         # 使用基于时间的更新，而不是基于帧的更新
         fall_speed = 500  # 毫秒，值越小，下落速度越快
         
+        self.start_time = pygame.time.get_ticks()
+        self.last_fall_time = self.start_time
+        if self.replay:
+            replay_inputs = iter(self.replay)
+            next_input = next(replay_inputs, None)
+        else:
+            self.start_recording()
+        self.undo_history.clear()
+        self.undo_history.append(self.engine.snapshot())
+        self.assisted = self.autoplayer is not None
+        
+        # 只有输入、重力下落或锁定改变了画面时才重绘；空闲时阻塞等待事件，
+        # 最多等到下一次重力下落（自动游戏和播放录像时每帧推进一次）
+        self.full_redraw = True
+        changed = True
+        timeout = 0
         while not self.game_over:
+            if changed:
+                self.draw()
+                # 限制帧率，但不影响游戏逻辑
+                self.clock.tick(60)
+                changed = False
+            
+            events = wait_events(timeout)
+            if self.profiler:
+                self.profiler.skip()  # 等待事件的空闲时间不计入帧耗时
             current_time = pygame.time.get_ticks()
             delta_time = current_time - self.last_fall_time
             
-            for event in pygame.event.get():
+            # 按键先收集起来，处理完事件之后再执行，引擎的耗时计入 logic 而不是 events
+            keys = []
+            for event in events:
                 if event.type == pygame.QUIT:
-                    # 更新用户统计信息
-                    if self.user_id:
-                        self.user_manager.update_user_stats(self.score)
+                    self.stop_recording()
+                    self.record_result()
                     return
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT:
-                        if self.valid_move(self.current_piece, self.current_piece['x'] - 1, self.current_piece['y']):
-                            self.current_piece['x'] -= 1
-                    elif event.key == pygame.K_RIGHT:
-                        if self.valid_move(self.current_piece, self.current_piece['x'] + 1, self.current_piece['y']):
-                            self.current_piece['x'] += 1
-                    elif event.key == pygame.K_DOWN:
-                        if self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y'] + 1):
-                            self.current_piece['y'] += 1
-                            # 重置下落时间
-                            self.last_fall_time = current_time
-                    elif event.key == pygame.K_UP:
-                        rotated = list(zip(*reversed(self.current_piece['shape'])))
-                        if self.valid_move({'shape': rotated, 'x': self.current_piece['x'], 'y': self.current_piece['y']},
-                                         self.current_piece['x'], self.current_piece['y']):
-                            self.current_piece['shape'] = rotated
-            
-            # 基于时间的方块下落
-            if delta_time >= fall_speed:
-                if self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y'] + 1):
-                    self.current_piece['y'] += 1
-                else:
-                    self.merge_piece()
-                    self.clear_lines()
-                    self.current_piece = self.next_piece
-                    self.next_piece = self.new_piece()
-                    if not self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y']):
-                        self.game_over = True
-                self.last_fall_time = current_time
+                if event.type in REDRAW_EVENTS:
+                    self.full_redraw = changed = True
+                if event.type == pygame.KEYDOWN and not self.replay:
+                    if event.key == pygame.K_a:
+                        self.autoplayer = None if self.autoplayer else AutoPlayer()
+                        if self.autoplayer:
+                            self.assisted = True
+                    else:
+                        keys.append(event.key)
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.toggle_profile()
+                    changed = True
+            if self.profiler:
+                self.profiler.lap('events')
             
-            self.draw()
+            for key in keys:
+                if key == pygame.K_LEFT:
+                    changed |= self.apply(LEFT)
+                elif key == pygame.K_RIGHT:
+                    changed |= self.apply(RIGHT)
+                elif key == pygame.K_DOWN:
+                    if self.apply(DOWN):
+                        # 重置下落时间
+                        self.last_fall_time = current_time
+                        changed = True
+                elif key == pygame.K_UP:
+                    changed |= self.apply(ROTATE)
+                elif key == pygame.K_SPACE:
+                    changed |= self.apply(HARD_DROP)
+                    self.last_fall_time = current_time
+                elif key == pygame.K_z:
+                    if self.undo():
+                        self.last_fall_time = current_time
+                        changed = True
             
-            # 限制帧率，但不影响游戏逻辑
-            self.clock.tick(60)
+            if self.replay:
+                # 播放录像：按录像中的帧数（除以播放速度）执行到期的输入，重力也来自录像
+                while next_input and (next_input[0] * 1000 / FRAME_RATE / self.replay_speed
+                                      <= current_time - self.start_time):
+                    self.engine.step(next_input[1])
+                    next_input = next(replay_inputs, None)
+                    changed = True
+                if next_input is None and not self.game_over:
+                    return  # 录像在游戏结束前就停止了
+                timeout = FRAME_TIME
+            else:
+                if self.autoplayer and not self.game_over:
+                    # 动作没有成功（例如被重力打乱了位置）时重新规划
+                    if self.apply(self.autoplayer.next_action(self.engine)):
+                        changed = True
+                    else:
+                        self.autoplayer.reset()
+                if delta_time >= fall_speed and not self.game_over:
+                    # 基于时间的方块下落
+                    self.apply(TICK)
+                    self.last_fall_time = current_time
+                    changed = True
+                if self.autoplayer:
+                    timeout = FRAME_TIME
+                else:
+                    timeout = self.last_fall_time + fall_speed - pygame.time.get_ticks()
+            if self.profiler:
+                self.profiler.lap('logic')
         
-        # 更新用户统计信息
-        if self.user_id:
-            self.user_manager.update_user_stats(self.score)
+        if changed:
+            self.draw()  # 画出导致游戏结束的最后一步
+        
+        self.stop_recording()
+        # 录像播放完后，再玩一次就是正常的新游戏
+        self.replay = None
+        
+        self.record_result()
         
         # 创建半透明的游戏结束覆盖层
         overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
@@ -729,9 +980,23 @@ class Tetris:
         # 显示最终分数 - 使用金色
         score_font = get_font(24)  # 减小字体
         final_score_text = score_font.render(f'最终分数:{self.score}', True, GOLD)
-        final_score_rect = final_score_text.get_rect(center=(SCREEN_WIDTH // 2, panel_y + 90))
+        final_score_rect = final_score_text.get_rect(center=(SCREEN_WIDTH // 2, panel_y + 80))
         self.screen.blit(final_score_text, final_score_rect)
         
+        # 显示排行榜名次
+        if self.user_id and self.assisted:
+            note_font = get_font(18)
+            note_text = note_font.render('辅助对局，不计入成绩', True, LIGHT_GRAY)
+            note_rect = note_text.get_rect(center=(SCREEN_WIDTH // 2, panel_y + 110))
+            self.screen.blit(note_text, note_rect)
+        elif self.user_id:
+            rank, total = self.user_manager.get_rank(self.user_id)
+            if rank is not None:
+                rank_font = get_font(18)
+                rank_text = rank_font.render(f'排名: 第{rank}名 / 共{total}人', True, WHITE)
+                rank_rect = rank_text.get_rect(center=(SCREEN_WIDTH // 2, panel_y + 110))
+                self.screen.blit(rank_text, rank_rect)
+        
         # 添加重玩按钮 - 使用更精致的按钮设计
         restart_font = get_font(20)  # 减小字体
         restart_text = restart_font.render('再玩一次', True, WHITE)
@@ -762,26 +1027,67 @@ class Tetris:
         # 等待玩家点击重玩按钮或关闭游戏
         waiting = True
         while waiting:
-            for event in pygame.event.get():
+            for event in wait_events():
                 if event.type == pygame.QUIT:
                     return
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     mouse_pos = pygame.mouse.get_pos()
                     if restart_rect.collidepoint(mouse_pos):
                         # 重置游戏状态
-                        self.grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-                        self.current_piece = self.new_piece()
-                        self.next_piece = self.new_piece()  # 重置下一个方块
-                        self.game_over = False
-                        self.score = 0
+                        self.engine.reset()
                         self.last_fall_time = pygame.time.get_ticks()  # 重置时间
                         return self.run()
                     elif logout_rect.collidepoint(mouse_pos):
                         return "logout"
 
+def positive_float(text):
+    # argparse 的类型：大于0的小数
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"不是数字: {text}")
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"必须大于0: {text}")
+    return value
+
 def main():
+    parser = argparse.ArgumentParser(description="俄罗斯方块")
+    parser.add_argument("--record", metavar="FILE", help="把每局游戏录像保存到文件")
+    parser.add_argument("--replay", metavar="FILE", help="播放录像文件")
+    parser.add_argument("--speed", type=positive_float, default=1.0, help="录像播放速度倍数")
+    parser.add_argument("--profile", metavar="FILE", help="把每帧的耗时写入CSV文件")
+    parser.add_argument("--refresh-fonts", action="store_true", help="重新查找系统字体（安装或删除字体之后使用）")
+    args = parser.parse_args()
+    
+    if args.refresh_fonts:
+        clear_font_cache()
+    
     user_manager = UserManager()
+    profiler = FrameProfiler(csv_path=args.profile) if args.profile else None
     
+    try:
+        if args.replay:
+            try:
+                replay = open_replay(args.replay)
+            except (OSError, ReplayError) as e:
+                print(f"无法播放录像 {args.replay}: {e}", file=sys.stderr)
+                return 1
+            try:
+                Tetris(user_manager, None, replay=replay, replay_speed=args.speed, profiler=profiler).run()
+            except ReplayError as e:
+                # 例如录像的棋盘大小与当前设置不同
+                print(f"无法播放录像 {args.replay}: {e}", file=sys.stderr)
+                return 1
+            finally:
+                replay.close()
+        else:
+            run_session(user_manager, args.record, profiler)
+    finally:
+        if profiler:
+            profiler.close()
+        user_manager.close()
+
+def run_session(user_manager, record_path=None, profiler=None):
     while True:
         # 显示登录界面
         login_screen = LoginScreen(user_manager)
@@ -791,12 +1097,14 @@ def main():
             break  # 用户关闭了窗口
         
         # 开始游戏
-        game = Tetris(user_manager, user_id)
+        game = Tetris(user_manager, user_id, record_path, profiler=profiler)
         result = game.run()
         
         if result != "logout":
             break  # 用户关闭了窗口
 
 if __name__ == '__main__':
-    main()
-    pygame.quit() 
\ No newline at end of file
+    try:
+        sys.exit(main())
+    finally:
+        pygame.quit()
\ No newline at end of file
@@ -0,0 +1,236 @@
+# 自动玩家：枚举当前方块所有能到达的落点并打分
+#
+# 对每个落点（旋转 × 列 × 下落到底）把方块放到棋盘上，消行后按加权启发式打分：
+#   总高度、空洞数、相邻列高度差之和越小越好，消除的行数越多越好
+# 可以选择再向前看一个方块（next_piece）：对第一步得分最高的几个落点，
+# 再枚举下一个方块的落点，取两步合计的最好结果。
+# 重复出现的棋盘状态记在有上限的置换表中，不重复计算。
+# 搜索只使用每行的位掩码，与棋盘的具体实现无关。
+from collections import OrderedDict, namedtuple
+
+from tetris_engine import LEFT, RIGHT, ROTATE, TICK, HARD_DROP
+from tetris_pieces import NEXT_ROTATION, ROTATIONS
+
+# 启发式权重
+WEIGHTS = {
+    'height': -0.510066,
+    'lines': 0.760666,
+    'holes': -0.35663,
+    'bumpiness': -0.184483,
+}
+TABLE_SIZE = 1 << 16  # 置换表最多保存的状态数
+LOOKAHEAD_BEAM = 6  # 向前看时只展开第一步得分最高的几个落点
+
+Placement = namedtuple('Placement', 'turns rotation x y score')
+
+
+class TranspositionTable:
+    # 有上限的LRU表，并统计命中次数
+    def __init__(self, max_size=TABLE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def fits(rows, state, x, y, width, height):
+    if x < 0 or x + state.width > width or y + state.height > height:
+        return False
+    i = y
+    for mask in state.masks:
+        if (mask << x) & rows[i]:
+            return False
+        i += 1
+    return True
+
+
+def drop(rows, state, x, y, height):
+    # 从 (x, y) 直接下落，返回落到底时的y
+    limit = height - state.height
+    masks = state.masks
+    while y < limit:
+        i = y + 1
+        for mask in masks:
+            if (mask << x) & rows[i]:
+                return y
+            i += 1
+        y += 1
+    return y
+
+
+def place(rows, state, x, y, full_row):
+    # 把方块放进棋盘并消行，返回 (新的各行掩码, 消除行数)
+    new_rows = list(rows)
+    i = y
+    for mask in state.masks:
+        new_rows[i] |= mask << x
+        i += 1
+    if full_row not in new_rows:
+        return tuple(new_rows), 0
+    kept = [row for row in new_rows if row != full_row]
+    lines = len(new_rows) - len(kept)
+    return tuple([0] * lines + kept), lines
+
+
+def board_features(rows, width, height):
+    # 返回 (总高度, 空洞数, 相邻列高度差之和)
+    heights = [0] * width
+    seen = 0
+    holes = 0
+    for i, row in enumerate(rows):
+        if not seen and not row:
+            continue
+        new = row & ~seen
+        if new:
+            column_height = height - i
+            while new:
+                low = new & -new
+                heights[low.bit_length() - 1] = column_height
+                new ^= low
+        seen |= row
+        # 上方已有方块、这一行却是空的格子就是空洞
+        holes += bin(seen & ~row).count('1')
+    bumpiness = 0
+    for c in range(width - 1):
+        bumpiness += abs(heights[c] - heights[c + 1])
+    return sum(heights), holes, bumpiness
+
+
+def enumerate_placements(rows, kind, rotation, x, y, width, height):
+    # 先在原位置旋转，再左右平移，最后直接下落；返回 (旋转次数, 旋转序号, x, 落点y)
+    states = ROTATIONS[kind]
+    results = []
+    for turns in range(len(states)):
+        if turns:
+            rotation = NEXT_ROTATION[kind][rotation]
+        state = states[rotation]
+        if not fits(rows, state, x, y, width, height):
+            break  # 转不过去，后面的旋转状态也到不了
+        left = x
+        while fits(rows, state, left, y, width, height):
+            results.append((turns, rotation, left, drop(rows, state, left, y, height)))
+            left -= 1
+        right = x + 1
+        while fits(rows, state, right, y, width, height):
+            results.append((turns, rotation, right, drop(rows, state, right, y, height)))
+            right += 1
+    return results
+
+
+class AutoPlayer:
+    def __init__(self, weights=None, lookahead=True, table_size=TABLE_SIZE):
+        self.weights = dict(WEIGHTS, **(weights or {}))
+        self.lookahead = lookahead
+        self.decisions = TranspositionTable(table_size)  # 局面 -> 最佳落点
+        self.evaluations = TranspositionTable(table_size)  # 棋盘 -> 静态评分
+        self.placements_evaluated = 0
+        self.actions = []
+        self.planned_piece = None
+
+    def evaluate(self, rows, width, height):
+        score = self.evaluations.get(rows)
+        if score is None:
+            total_height, holes, bumpiness = board_features(rows, width, height)
+            weights = self.weights
+            score = (weights['height'] * total_height + weights['holes'] * holes +
+                     weights['bumpiness'] * bumpiness)
+            self.evaluations.put(rows, score)
+        return score
+
+    def score_placements(self, rows, kind, rotation, x, y, width, height):
+        # 返回 [(得分, 落点, 放置后的棋盘)]
+        full_row = (1 << width) - 1
+        line_weight = self.weights['lines']
+        states = ROTATIONS[kind]
+        scored = []
+        for placement in enumerate_placements(rows, kind, rotation, x, y, width, height):
+            turns, target_rotation, target_x, target_y = placement
+            new_rows, lines = place(rows, states[target_rotation], target_x, target_y, full_row)
+            score = self.evaluate(new_rows, width, height) + line_weight * lines
+            scored.append((score, placement, new_rows))
+        self.placements_evaluated += len(scored)
+        return scored
+
+    def best_placement(self, rows, kind, rotation, x, y, width, height, next_kind=None):
+        if not self.lookahead:
+            next_kind = None
+        key = (rows, kind, rotation, x, y, next_kind)
+        best = self.decisions.get(key)
+        if best is not None:
+            return best
+        scored = self.score_placements(rows, kind, rotation, x, y, width, height)
+        if not scored:
+            return None
+        if next_kind is None:
+            score, placement, _ = max(scored, key=lambda item: item[0])
+        else:
+            # 向前看一个方块：下一个方块从出生位置开始
+            scored.sort(key=lambda item: item[0], reverse=True)
+            next_x = width // 2 - ROTATIONS[next_kind][0].width // 2
+            score, placement = None, None
+            for first_score, first, new_rows in scored[:LOOKAHEAD_BEAM]:
+                second = self.score_placements(new_rows, next_kind, 0, next_x, 0, width, height)
+                if not second:
+                    continue  # 下一个方块放不下，等于游戏结束
+                total = first_score + max(item[0] for item in second)
+                if score is None or total > score:
+                    score, placement = total, first
+            if placement is None:
+                score, placement, _ = scored[0]
+        best = Placement(placement[0], placement[1], placement[2], placement[3], score)
+        self.decisions.put(key, best)
+        return best
+
+    def plan(self, engine):
+        # 为当前方块生成到达最佳落点的动作序列：旋转、平移，然后直接落到底
+        piece = engine.current_piece
+        best = self.best_placement(engine.board.row_masks(), piece.kind, piece.rotation, piece.x, piece.y,
+                                   engine.width, engine.height, engine.next_piece.kind)
+        if best is None:
+            return [TICK]
+        dx = best.x - piece.x
+        return [ROTATE] * best.turns + [RIGHT if dx > 0 else LEFT] * abs(dx) + [HARD_DROP]
+
+    def reset(self):
+        # 清空当前计划，下一次会重新搜索（例如某个动作没有成功时）
+        self.actions = []
+        self.planned_piece = None
+
+    def next_action(self, engine):
+        piece = engine.current_piece
+        if piece is not self.planned_piece or not self.actions:
+            self.actions = self.plan(engine)
+            self.actions.reverse()
+            self.planned_piece = piece
+        return self.actions.pop()
+
+
+_policy_player = None
+
+
+def ai_policy(engine, rng):
+    # 供自动对局使用的策略，每个进程一个自动玩家
+    global _policy_player
+    if _policy_player is None:
+        _policy_player = AutoPlayer()
+    return _policy_player.next_action(engine)
@@ -0,0 +1,204 @@
+# 基于NumPy的批量引擎：一次推进成千上万个棋盘
+#
+# 所有棋盘保存在一个连续的 (N, 高度) 整数数组中，每个元素是一行的
+# 位掩码（与 BitBoard 相同的表示），碰撞、锁定和消行都按批量向量化计算。
+# 分数、行数、游戏结束标志和方块队列也都是数组。
+# 每个棋盘使用与 TetrisEngine 相同的 PieceSequence(种子, 随机方式) 生成方块，
+# 所以相同种子和相同动作序列下结果与单棋盘引擎完全一致。
+# 方块序列按 QUEUE_CHUNK 个一块生成（序列本身与分块大小无关），重开一个棋盘很便宜。
+import numpy as np  # type: ignore
+
+from tetris_engine import GRID_WIDTH, GRID_HEIGHT, LINE_SCORE, LEFT, RIGHT, DOWN, ROTATE, TICK, HARD_DROP
+from tetris_pieces import NEXT_ROTATION, PIECE_COUNT, ROTATIONS
+from tetris_random import PieceSequence
+
+QUEUE_CHUNK = 64  # 每个棋盘一次预生成的方块数量
+MAX_ROTATIONS = max(len(states) for states in ROTATIONS)
+MAX_PIECE_ROWS = 4
+
+
+def _build_tables():
+    masks = np.zeros((PIECE_COUNT, MAX_ROTATIONS, MAX_PIECE_ROWS), dtype=np.int64)
+    widths = np.zeros((PIECE_COUNT, MAX_ROTATIONS), dtype=np.int64)
+    heights = np.zeros((PIECE_COUNT, MAX_ROTATIONS), dtype=np.int64)
+    next_rotation = np.zeros((PIECE_COUNT, MAX_ROTATIONS), dtype=np.int64)
+    for kind, states in enumerate(ROTATIONS):
+        for rotation, state in enumerate(states):
+            masks[kind, rotation, :state.height] = state.masks
+            widths[kind, rotation] = state.width
+            heights[kind, rotation] = state.height
+            next_rotation[kind, rotation] = NEXT_ROTATION[kind][rotation]
+    return masks, widths, heights, next_rotation
+
+
+PIECE_MASKS, PIECE_WIDTHS, PIECE_HEIGHTS, PIECE_NEXT_ROTATION = _build_tables()
+
+
+class BatchTetrisEngine:
+    def __init__(self, count, width=GRID_WIDTH, height=GRID_HEIGHT, seeds=None, randomizer='uniform'):
+        if width > 62:
+            raise ValueError("批量引擎的棋盘宽度不能超过62")
+        self.count = count
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+        self._row_offsets = np.arange(MAX_PIECE_ROWS)
+        self._row_numbers = np.arange(height)
+        self.randomizer = randomizer
+        self.reset(seeds)
+
+    def reset(self, seeds=None):
+        count = self.count
+        if seeds is None:
+            seeds = np.random.SeedSequence().generate_state(count).tolist()
+        if len(seeds) != count:
+            raise ValueError("种子数量必须与棋盘数量相同")
+        self.seeds = list(seeds)
+        self.sequences = [PieceSequence(seed, self.randomizer, QUEUE_CHUNK) for seed in self.seeds]
+
+        self.rows = np.zeros((count, self.height), dtype=np.int64)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.lines = np.zeros(count, dtype=np.int64)
+        self.pieces = np.zeros(count, dtype=np.int64)
+        self.steps = np.zeros(count, dtype=np.int64)
+        self.game_over = np.zeros(count, dtype=bool)
+
+        # 方块队列：每个棋盘预生成一段方块类型，游标指向下一个要取的位置
+        self.queue = np.zeros((count, QUEUE_CHUNK), dtype=np.int64)
+        for board in range(count):
+            self._refill_queue(board)
+        self.cursor = np.full(count, 2, dtype=np.int64)
+
+        self.kind = self.queue[:, 0].copy()
+        self.next_kind = self.queue[:, 1].copy()
+        self.rotation = np.zeros(count, dtype=np.int64)
+        self.x = self._spawn_x(self.kind)
+        self.y = np.zeros(count, dtype=np.int64)
+
+    def reset_board(self, board, seed):
+        # 只重新开始其中一个棋盘（例如向量化环境在一局结束时自动重开）
+        self.seeds[board] = seed
+        self.sequences[board] = PieceSequence(seed, self.randomizer, QUEUE_CHUNK)
+        self.rows[board] = 0
+        self.score[board] = 0
+        self.lines[board] = 0
+        self.pieces[board] = 0
+        self.steps[board] = 0
+        self.game_over[board] = False
+        self._refill_queue(board)
+        self.cursor[board] = 2
+        kind = self.queue[board, 0]
+        self.kind[board] = kind
+        self.next_kind[board] = self.queue[board, 1]
+        self.rotation[board] = 0
+        self.x[board] = self._spawn_x(kind)
+        self.y[board] = 0
+
+    def _refill_queue(self, board):
+        self.queue[board] = self.sequences[board].take(QUEUE_CHUNK)
+
+    def _spawn_x(self, kind):
+        return self.width // 2 - PIECE_WIDTHS[kind, 0] // 2
+
+    def fits(self, boards, kind, rotation, x, y):
+        # 对一组棋盘同时做碰撞检测，返回布尔数组
+        ok = ((x >= 0) & (x + PIECE_WIDTHS[kind, rotation] <= self.width) &
+              (y + PIECE_HEIGHTS[kind, rotation] <= self.height))
+        row_index = y[:, None] + self._row_offsets
+        rows = self.rows[boards[:, None], np.clip(row_index, 0, self.height - 1)]
+        shifted = PIECE_MASKS[kind, rotation] << np.maximum(x, 0)[:, None]
+        overlap = ((shifted & rows) != 0) & (row_index >= 0)
+        return ok & ~overlap.any(axis=1)
+
+    def step(self, actions):
+        # 每个棋盘执行一个动作，返回每个棋盘的状态是否发生了变化
+        actions = np.asarray(actions)
+        changed = np.zeros(self.count, dtype=bool)
+        boards = np.flatnonzero(~self.game_over)
+        if not len(boards):
+            return changed
+        self.steps[boards] += 1
+        action = actions[boards]
+        dropping = boards[action == HARD_DROP]
+        if len(dropping):
+            self._hard_drop(dropping)
+            changed[dropping] = True
+        moving = ((action == LEFT) | (action == RIGHT) | (action == DOWN) |
+                  (action == ROTATE) | (action == TICK))
+        boards = boards[moving]
+        action = action[moving]
+        if not len(boards):
+            return changed
+
+        kind = self.kind[boards]
+        rotation = self.rotation[boards]
+        x = self.x[boards] + (action == RIGHT) - (action == LEFT)
+        y = self.y[boards] + ((action == DOWN) | (action == TICK))
+        rotation = np.where(action == ROTATE, PIECE_NEXT_ROTATION[kind, rotation], rotation)
+
+        ok = self.fits(boards, kind, rotation, x, y)
+        moved = boards[ok]
+        self.x[moved] = x[ok]
+        self.y[moved] = y[ok]
+        self.rotation[moved] = rotation[ok]
+        changed[moved] = True
+
+        # 重力下落不下去的棋盘锁定方块
+        locking = boards[~ok & (action == TICK)]
+        if len(locking):
+            self._lock(locking)
+            changed[locking] = True
+        return changed
+
+    def _hard_drop(self, boards):
+        # 所有还能下落的棋盘一起下移一格，直到都落到底，然后锁定
+        falling = boards
+        while len(falling):
+            y = self.y[falling] + 1
+            ok = self.fits(falling, self.kind[falling], self.rotation[falling], self.x[falling], y)
+            falling = falling[ok]
+            self.y[falling] = y[ok]
+        self._lock(boards)
+
+    def _lock(self, boards):
+        kind = self.kind[boards]
+        rotation = self.rotation[boards]
+        x = self.x[boards]
+        y = self.y[boards]
+
+        # 合并：只写入非空的方块行，避免填充行的重复下标互相覆盖
+        masks = PIECE_MASKS[kind, rotation] << x[:, None]
+        filled = masks != 0
+        board_index = np.broadcast_to(boards[:, None], masks.shape)[filled]
+        row_index = (y[:, None] + self._row_offsets)[filled]
+        self.rows[board_index, row_index] |= masks[filled]
+
+        # 消行：满行排到最前面再清零，其余行保持原有顺序
+        rows = self.rows[boards]
+        full = rows == self.full_row
+        cleared = full.sum(axis=1)
+        clearing = cleared > 0
+        if clearing.any():
+            sub_rows = rows[clearing]
+            order = np.argsort(~full[clearing], axis=1, kind='stable')
+            sub_rows = np.take_along_axis(sub_rows, order, axis=1)
+            sub_rows[self._row_numbers[None, :] < cleared[clearing][:, None]] = 0
+            self.rows[boards[clearing]] = sub_rows
+        self.lines[boards] += cleared
+        self.score[boards] += cleared * LINE_SCORE
+        self.pieces[boards] += 1
+
+        # 换上下一个方块，并从队列中取新的下一个方块
+        self.kind[boards] = self.next_kind[boards]
+        for board in boards[self.cursor[boards] >= QUEUE_CHUNK]:
+            self._refill_queue(board)
+            self.cursor[board] = 0
+        self.next_kind[boards] = self.queue[boards, self.cursor[boards]]
+        self.cursor[boards] += 1
+        kind = self.kind[boards]
+        self.rotation[boards] = 0
+        self.x[boards] = self._spawn_x(kind)
+        self.y[boards] = 0
+
+        spawn_ok = self.fits(boards, kind, self.rotation[boards], self.x[boards], self.y[boards])
+        self.game_over[boards[~spawn_ok]] = True
@@ -0,0 +1,449 @@
+# 棋盘实现（不依赖pygame，可用于无界面模拟）
+#
+# GridBoard: 原来的二维列表实现，每个格子保存方块编号
+# BitBoard:  每行一个整数位掩码表示占用情况，方块编号单独保存在旁表中
+#            （每格4位打包成一个整数），碰撞检测、合并和满行检测
+#            都只需要对每一行做几次移位/与运算
+# RingBoard: 与 BitBoard 相同的行表示，但各行放在环形缓冲区中，逻辑行号经过
+#            偏移映射到物理位置。消行时只移动被消除行与最近一端（方块堆顶部
+#            或棋盘底部）之间的行，满行检测只看刚合并的方块覆盖的几行，
+#            很高的棋盘（例如 40x400）消行也不需要移动整个棋盘
+#
+# 方块使用 tetris_pieces 中预计算的 PieceState，格子里保存的编号为
+# 方块类型 + 1，0 表示空格
+#
+# 三种棋盘都在合并和消行时增量维护统计信息（BoardStats）：
+#   heights  每列的高度（最上面一个方块到底部的格数）
+#   fill     每行已占用的格子数，满行检测只需比较计数
+#            （RingBoard 的计数 counts 按物理位置保存、随行一起移动，fill 只是按逻辑行排列的视图）
+#   holes    空洞数（上方有方块的空格子）= 各列高度之和 - 方块格子总数
+# 另外记下最近一次消除的行号 cleared_rows，状态流只需发送这几个行号而不是下移的整块棋盘
+# 有了列高，直接下落的落点只需看方块的每一列，不用逐行检测碰撞
+#
+# snapshot() 返回不可变的棋盘状态，restore() 恢复到该状态。快照只保存每行的方块编号
+# （row_kinds()，每行一个整数）和几个标量统计，占用位掩码、每行格子数和列高都在
+# 恢复时由方块编号重新算出。棋盘只在合并和消行时变化，两次变化之间重复调用
+# snapshot() 返回同一个对象，恢复到当前状态的快照不需要做任何事
+
+
+def kinds_to_masks(kinds, width):
+    # 每格4位的方块编号 -> 每格1位的占用掩码。把每格的4位或到最低位上，
+    # 十六进制的每一位就是0或1，按二进制读回即可
+    ones = int('1' * width, 16)
+    return [int(format((row | row >> 1 | row >> 2 | row >> 3) & ones, 'x'), 2) if row else 0 for row in kinds]
+
+
+def column_heights(masks, width, height):
+    # 由各行的占用掩码计算每列的高度，从顶部向下找每列第一个方块
+    heights = [0] * width
+    seen = 0
+    full = (1 << width) - 1
+    for i, mask in enumerate(masks):
+        new = mask & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = height - i
+            new ^= low
+        seen |= mask
+        if seen == full:
+            break
+    return heights
+
+
+def row_counts(masks):
+    # 每行已占用的格子数
+    return [bin(mask).count('1') if mask else 0 for mask in masks]
+
+
+class BoardStats:
+    def reset_stats(self):
+        self.heights = [0] * self.width
+        self.fill = [0] * self.height
+        self.cell_count = 0
+        self.holes = 0
+        self.cleared_rows = ()
+        self.saved = None  # 当前状态的快照，棋盘变化时作废
+
+    def track_merge(self, state, x, y):
+        self.track_heights(state, x, y)
+        fill = self.fill
+        for i, j in state.cells:
+            fill[y + i] += 1
+
+    def track_heights(self, state, x, y):
+        self.saved = None
+        heights = self.heights
+        grown = 0
+        for col, top in enumerate(state.top):
+            column_height = self.height - y - top
+            if column_height > heights[x + col]:
+                grown += column_height - heights[x + col]
+                heights[x + col] = column_height
+        self.cell_count += len(state.cells)
+        self.holes += grown - len(state.cells)
+
+    def track_clear(self, cleared):
+        # cleared 是消除前满行的行号；在棋盘删除这些行之后调用
+        self.fill = [0] * len(cleared) + [count for count in self.fill if count != self.width]
+        self.track_cleared_heights(cleared)
+
+    def track_cleared_heights(self, cleared):
+        self.saved = None
+        self.cleared_rows = tuple(cleared)
+        lines_cleared = len(cleared)
+        self.cell_count -= lines_cleared * self.width
+        cleared = set(cleared)
+        heights = self.heights
+        for col in range(self.width):
+            if self.height - heights[col] in cleared:
+                # 这一列最上面的方块被消掉了，下面可能是空洞，重新向下查找
+                heights[col] = self.scan_height(col, self.height - heights[col] + lines_cleared)
+            else:
+                # 满行都在列顶之下，列顶整体下移
+                heights[col] -= lines_cleared
+        self.holes = sum(heights) - self.cell_count
+
+    def snapshot(self):
+        # (各行方块编号, 格子总数, 空洞数, 最近消除的行号) + 各实现额外保存的状态
+        if self.saved is None:
+            self.saved = (self.row_kinds(), self.cell_count, self.holes, self.cleared_rows) + self.save_state()
+        return self.saved
+
+    def restore(self, snapshot):
+        if snapshot is self.saved:
+            return
+        kinds, self.cell_count, self.holes, self.cleared_rows = snapshot[:4]
+        masks = kinds_to_masks(kinds, self.width)
+        self.load_state(kinds, masks, snapshot[4:])
+        self.heights = column_heights(masks, self.width, self.height)
+        self.saved = snapshot
+
+    def save_state(self):
+        return ()
+
+    def scan_height(self, col, row):
+        # 从第row行向下找第col列最上面的方块，返回列高
+        for i in range(row, self.height):
+            if self.cell(i, col):
+                return self.height - i
+        return 0
+
+    def landing_y(self, state, x, y):
+        # 方块从 (x, y) 直接下落到底时的y，只看方块覆盖的几列
+        heights = self.heights
+        land = self.height
+        for col, bottom in enumerate(state.bottom):
+            column_land = self.height - heights[x + col] - 1 - bottom
+            if column_land < land:
+                land = column_land
+        if land >= y:
+            return land
+        # 方块已经在某列的顶部之下（钻进了悬空部分下面），只能逐行检测
+        while self.fits(state, x, y + 1):
+            y += 1
+        return y
+
+
+class GridBoard(BoardStats):
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.reset()
+
+    def reset(self):
+        self.grid = [[0 for _ in range(self.width)] for _ in range(self.height)]
+        self.reset_stats()
+
+    def cell(self, row, col):
+        return self.grid[row][col]
+
+    def load_state(self, kinds, masks, extra):
+        columns = range(self.width)
+        self.grid = [[row >> (4 * j) & 15 for j in columns] for row in kinds]
+        self.fill = row_counts(masks)
+
+    def occupied_cells(self):
+        # 依次返回所有非空格子的 (行, 列, 编号)
+        for i, row in enumerate(self.grid):
+            for j, code in enumerate(row):
+                if code:
+                    yield i, j, code
+
+    def row_masks(self):
+        # 每行的占用位掩码（第j列对应第j位），供搜索等代码使用
+        return tuple(sum(1 << j for j, code in enumerate(row) if code) for row in self.grid)
+
+    def row_kinds(self):
+        # 每行的方块编号打包成一个整数（第j列在第4j位起的4位），与 BitBoard.kinds 相同
+        return tuple(sum(code << (4 * j) for j, code in enumerate(row)) for row in self.grid)
+
+    def fits(self, state, x, y):
+        for i, j in state.cells:
+            if (x + j < 0 or x + j >= self.width or
+                y + i >= self.height or
+                (y + i >= 0 and self.grid[y + i][x + j])):
+                return False
+        return True
+
+    def merge(self, state, x, y, kind):
+        for i, j in state.cells:
+            self.grid[y + i][x + j] = kind + 1
+        self.track_merge(state, x, y)
+
+    def clear_lines(self):
+        # 返回本次消除的行数
+        fill = self.fill
+        if self.width not in fill:
+            return 0
+        cleared = [i for i in range(self.height) if fill[i] == self.width]
+        kept = [row for i, row in enumerate(self.grid) if fill[i] != self.width]
+        self.grid = [[0 for _ in range(self.width)] for _ in cleared] + kept
+        self.track_clear(cleared)
+        return len(cleared)
+
+
+class BitBoard(BoardStats):
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.reset()
+
+    def reset(self):
+        self.rows = [0] * self.height
+        # 方块编号旁表，只在合并和绘制时访问
+        self.kinds = [0] * self.height
+        self.reset_stats()
+
+    def cell(self, row, col):
+        return self.kinds[row] >> (4 * col) & 15
+
+    def load_state(self, kinds, masks, extra):
+        self.rows = masks
+        self.kinds = list(kinds)
+        self.fill = row_counts(masks)
+
+    def occupied_cells(self):
+        # 空行直接跳过，非空行只遍历被占用的位
+        kinds = self.kinds
+        for i, mask in enumerate(self.rows):
+            j = 0
+            while mask:
+                if mask & 1:
+                    yield i, j, kinds[i] >> (4 * j) & 15
+                mask >>= 1
+                j += 1
+
+    def row_masks(self):
+        return tuple(self.rows)
+
+    def row_kinds(self):
+        return tuple(self.kinds)
+
+    def fits(self, state, x, y):
+        # 方块的包围盒是紧凑的（每行每列都有格子），边界检查只需看包围盒
+        if x < 0 or x + state.width > self.width or y + state.height > self.height:
+            return False
+        rows = self.rows
+        i = y
+        for mask in state.masks:
+            if i >= 0 and (mask << x) & rows[i]:
+                return False
+            i += 1
+        return True
+
+    def merge(self, state, x, y, kind):
+        rows = self.rows
+        kinds = self.kinds
+        code = kind + 1
+        shift = 4 * x
+        i = y
+        for mask, nibble in zip(state.masks, state.nibbles):
+            rows[i] |= mask << x
+            kinds[i] |= (nibble * code) << shift
+            i += 1
+        self.track_merge(state, x, y)
+
+    def scan_height(self, col, row):
+        bit = 1 << col
+        rows = self.rows
+        for i in range(row, self.height):
+            if rows[i] & bit:
+                return self.height - i
+        return 0
+
+    def clear_lines(self):
+        fill = self.fill
+        if self.width not in fill:
+            return 0
+        rows = self.rows
+        kept = [i for i in range(self.height) if fill[i] != self.width]
+        lines_cleared = self.height - len(kept)
+        padding = [0] * lines_cleared
+        self.rows = padding + [rows[i] for i in kept]
+        self.kinds = padding + [self.kinds[i] for i in kept]
+        self.track_clear([i for i in range(self.height) if fill[i] == self.width])
+        return lines_cleared
+
+
+class RingBoard(BoardStats):
+    # 逻辑第r行保存在物理位置 (top + r) % height；
+    # 每行的格子数 counts 也按物理位置保存，随行一起移动
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.reset()
+
+    def reset(self):
+        self.rows = [0] * self.height
+        self.kinds = [0] * self.height
+        self.counts = [0] * self.height
+        self.top = 0
+        self.merged = None  # 上一次合并覆盖的逻辑行范围，只有这些行可能变满
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.heights = [0] * self.width
+        self.cell_count = 0
+        self.holes = 0
+        self.cleared_rows = ()
+        self.saved = None  # 当前状态的快照，棋盘变化时作废
+
+    @property
+    def fill(self):
+        # 按逻辑行排列的每行格子数（只用于查看，内部使用 counts）
+        return self.counts[self.top:] + self.counts[:self.top]
+
+    def physical(self, row):
+        row += self.top
+        return row - self.height if row >= self.height else row
+
+    def cell(self, row, col):
+        return self.kinds[self.physical(row)] >> (4 * col) & 15
+
+    def save_state(self):
+        # 快照中的行按逻辑顺序保存，恢复后环的起点为0；merged 也是逻辑行号，不受影响
+        return (self.merged,)
+
+    def load_state(self, kinds, masks, extra):
+        self.rows = masks
+        self.kinds = list(kinds)
+        self.counts = row_counts(masks)
+        self.top = 0
+        self.merged = extra[0]
+
+    def occupied_cells(self):
+        # 方块堆顶部以上都是空行，直接从堆顶开始
+        kinds = self.kinds
+        rows = self.rows
+        for i in range(self.height - max(self.heights), self.height):
+            p = self.physical(i)
+            mask = rows[p]
+            j = 0
+            while mask:
+                if mask & 1:
+                    yield i, j, kinds[p] >> (4 * j) & 15
+                mask >>= 1
+                j += 1
+
+    def row_masks(self):
+        return tuple(self.rows[self.top:] + self.rows[:self.top])
+
+    def row_kinds(self):
+        return tuple(self.kinds[self.top:] + self.kinds[:self.top])
+
+    def fits(self, state, x, y):
+        if x < 0 or x + state.width > self.width or y + state.height > self.height:
+            return False
+        rows = self.rows
+        height = self.height
+        p = y + self.top
+        for mask in state.masks:
+            if y >= 0:
+                if p >= height:
+                    p -= height
+                if (mask << x) & rows[p]:
+                    return False
+            p += 1
+            y += 1
+        return True
+
+    def merge(self, state, x, y, kind):
+        rows = self.rows
+        kinds = self.kinds
+        counts = self.counts
+        code = kind + 1
+        shift = 4 * x
+        height = self.height
+        p = y + self.top
+        for mask, nibble in zip(state.masks, state.nibbles):
+            if p >= height:
+                p -= height
+            rows[p] |= mask << x
+            kinds[p] |= (nibble * code) << shift
+            counts[p] += bin(mask).count('1')
+            p += 1
+        self.track_heights(state, x, y)
+        self.merged = (y, y + state.height)
+
+    def scan_height(self, col, row):
+        bit = 1 << col
+        rows = self.rows
+        for i in range(row, self.height):
+            if rows[self.physical(i)] & bit:
+                return self.height - i
+        return 0
+
+    def move_row(self, source, target):
+        # 把物理行 source 复制到物理行 target
+        self.rows[target] = self.rows[source]
+        self.kinds[target] = self.kinds[source]
+        self.counts[target] = self.counts[source]
+
+    def clear_row(self, p):
+        self.rows[p] = 0
+        self.kinds[p] = 0
+        self.counts[p] = 0
+
+    def clear_lines(self):
+        if self.merged is None:
+            return 0
+        first, last = self.merged
+        self.merged = None
+        counts = self.counts
+        cleared = [i for i in range(first, last) if counts[self.physical(i)] == self.width]
+        if not cleared:
+            return 0
+        height = self.height
+        stack_top = height - max(self.heights)
+        # 从上往下逐行删除：删除一行只会让它上面的行下移，下面还没处理的满行行号不变
+        for row in cleared:
+            if row - stack_top <= height - 1 - row:
+                # 把堆顶到这一行之间的行下移一格，空出来的堆顶行清空
+                for i in range(row, stack_top, -1):
+                    self.move_row(self.physical(i - 1), self.physical(i))
+                self.clear_row(self.physical(stack_top))
+            else:
+                # 把这一行下面的行上移一格，再把环的起点前移一格，
+                # 空出来的最底下一行就成了新的最上面一行
+                for i in range(row, height - 1):
+                    self.move_row(self.physical(i + 1), self.physical(i))
+                self.top = self.top - 1 if self.top else height - 1
+                self.clear_row(self.top)
+            stack_top += 1
+        self.track_cleared_heights(cleared)
+        return len(cleared)
+
+
+BOARD_TYPES = {
+    'grid': GridBoard,
+    'bit': BitBoard,
+    'ring': RingBoard,
+}
+RING_BOARD_MIN_HEIGHT = 64  # 'auto' 在棋盘至少这么高时使用 RingBoard
+
+
+def make_board(board_type, width, height):
+    # 'auto' 按棋盘高度选择：普通高度用 BitBoard，很高的棋盘用 RingBoard
+    if board_type == 'auto':
+        board_type = 'ring' if height >= RING_BOARD_MIN_HEIGHT else 'bit'
+    return BOARD_TYPES[board_type](width, height)
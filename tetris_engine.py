@@ -0,0 +1,165 @@
+# 无界面的游戏规则核心（不导入pygame）
+#
+# 生成、移动、旋转、重力下落、锁定、消行、计分和游戏结束都在这里，
+# 通过 step(action) 显式推进，不依赖真实时间。界面层只负责把按键和
+# 下落计时转换成动作，再把状态画出来。
+#
+# snapshot() / restore() 用于撤销和搜索：快照是不可变的元组。只在锁定方块时才会
+# 变化的部分（棋盘、方块序列、分数等）在两次锁定之间共用同一个元组，
+# 每一步的快照只多出当前方块的位置和步数，恢复到同一个方块期间的快照不需要复制棋盘。
+# 快照中只有方块序列的不可变状态和 (种子, 随机方式)，不会让两个引擎共用同一个 PieceSequence。
+import random
+from collections import namedtuple
+
+from tetris_board import make_board
+from tetris_pieces import NEXT_ROTATION, ROTATIONS, Piece, spawn_piece
+from tetris_random import PieceSequence
+
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+LINE_SCORE = 100  # 每消一行的得分
+
+# 动作编号
+NOOP = 0
+LEFT = 1
+RIGHT = 2
+DOWN = 3  # 软降：只下移一格，不会锁定
+ROTATE = 4
+TICK = 5  # 重力下落一格，落不下去则锁定
+HARD_DROP = 6  # 直接落到底并锁定
+ACTIONS = (NOOP, LEFT, RIGHT, DOWN, ROTATE, TICK, HARD_DROP)
+
+# locked 是锁定方块时才会变化的部分：
+#   (棋盘快照, 随机方式, 序列快照, 下一个方块类型, 种子, 分数, 行数, 方块数, 最近消除行数, 是否结束)
+# 序列快照是 PieceSequence.snapshot() 的不可变状态，恢复时连同种子和随机方式写回本引擎自己的序列
+EngineSnapshot = namedtuple('EngineSnapshot', 'locked kind rotation x y steps')
+
+
+class TetrisEngine:
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, board_type='bit', seed=None,
+                 randomizer='uniform'):
+        self.width = width
+        self.height = height
+        self.board = make_board(board_type, width, height)
+        self.randomizer = randomizer
+        self.reset(seed)
+
+    def reset(self, seed=None, randomizer=None):
+        # 不指定种子时随机选一个，保证每局都可以用 (种子, 随机方式) 复现
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        if randomizer is not None:
+            self.randomizer = randomizer
+        self.seed = seed
+        self.sequence = PieceSequence(seed, self.randomizer)
+        self.board.reset()
+        self.score = 0
+        self.lines = 0  # 累计消除行数
+        self.pieces = 0  # 累计出现的方块数
+        self.steps = 0
+        self.last_cleared = 0  # 最近一次锁定消除的行数
+        self.game_over = False
+        self.current_piece = self.new_piece()
+        self.next_piece = self.new_piece()
+        self.locked = None  # 当前 locked 部分的快照，锁定方块时作废
+
+    def new_piece(self):
+        return spawn_piece(self.sequence.next(), self.width)
+
+    def preview(self, count):
+        # 接下来会出现的count个方块类型（从 next_piece 开始）
+        return [self.next_piece.kind] + self.sequence.peek(count - 1)
+
+    def valid_move(self, piece, x, y):
+        return self.board.fits(piece.state, x, y)
+
+    def landing_y(self, piece=None):
+        # 方块直接落到底时的y，也用于绘制落点预览
+        if piece is None:
+            piece = self.current_piece
+        return self.board.landing_y(piece.state, piece.x, piece.y)
+
+    def merge_piece(self):
+        self.locked = None
+        piece = self.current_piece
+        self.board.merge(piece.state, piece.x, piece.y, piece.kind)
+
+    def clear_lines(self):
+        self.locked = None
+        lines_cleared = self.board.clear_lines()
+        self.lines += lines_cleared
+        self.score += lines_cleared * LINE_SCORE
+        return lines_cleared
+
+    def lock_piece(self):
+        # 锁定当前方块，消行，然后换上下一个方块
+        self.merge_piece()
+        self.last_cleared = self.clear_lines()
+        self.pieces += 1
+        self.current_piece = self.next_piece
+        self.next_piece = self.new_piece()
+        if not self.valid_move(self.current_piece, self.current_piece.x, self.current_piece.y):
+            self.game_over = True
+        self.locked = None
+
+    def snapshot(self):
+        locked = self.locked
+        if locked is None:
+            locked = self.locked = (self.board.snapshot(), self.randomizer, self.sequence.snapshot(),
+                                    self.next_piece.kind, self.seed, self.score, self.lines, self.pieces,
+                                    self.last_cleared, self.game_over)
+        piece = self.current_piece
+        return EngineSnapshot(locked, piece.kind, piece.rotation, piece.x, piece.y, self.steps)
+
+    def restore(self, snapshot):
+        # 快照必须来自同一个引擎（棋盘类型和大小相同）
+        locked = snapshot.locked
+        if locked is not self.locked:
+            (board, self.randomizer, sequence_state, next_kind, self.seed, self.score, self.lines,
+             self.pieces, self.last_cleared, self.game_over) = locked
+            self.board.restore(board)
+            sequence = self.sequence
+            if sequence.seed != self.seed or sequence.randomizer != self.randomizer:
+                # 快照来自 reset 之前的另一局，换一个本引擎自己的序列
+                sequence = self.sequence = PieceSequence(self.seed, self.randomizer)
+            sequence.restore(sequence_state)
+            self.next_piece = spawn_piece(next_kind, self.width)
+            self.locked = locked
+        self.current_piece = Piece(snapshot.kind, snapshot.rotation, snapshot.x, snapshot.y)
+        self.steps = snapshot.steps
+
+    def step(self, action):
+        # 执行一个动作，返回状态是否发生了变化
+        if self.game_over:
+            return False
+        self.steps += 1
+        piece = self.current_piece
+        board = self.board
+        if action == TICK:
+            if board.fits(piece.state, piece.x, piece.y + 1):
+                piece.y += 1
+            else:
+                self.lock_piece()
+            return True
+        if action == HARD_DROP:
+            piece.y = board.landing_y(piece.state, piece.x, piece.y)
+            self.lock_piece()
+            return True
+        if action == LEFT:
+            if board.fits(piece.state, piece.x - 1, piece.y):
+                piece.x -= 1
+                return True
+        elif action == RIGHT:
+            if board.fits(piece.state, piece.x + 1, piece.y):
+                piece.x += 1
+                return True
+        elif action == DOWN:
+            if board.fits(piece.state, piece.x, piece.y + 1):
+                piece.y += 1
+                return True
+        elif action == ROTATE:
+            rotation = NEXT_ROTATION[piece.kind][piece.rotation]
+            if board.fits(ROTATIONS[piece.kind][rotation], piece.x, piece.y):
+                piece.rotation = rotation
+                return True
+        return False
@@ -0,0 +1,306 @@
+# 强化学习环境：gymnasium 风格的 reset(seed) / step(action) 接口（不依赖pygame）
+#
+#   env = TetrisEnv(features=('heights', 'holes', 'piece_mask'))
+#   observation, info = env.reset(seed=0)
+#   observation, reward, terminated, truncated, info = env.step(HARD_DROP)
+#
+# 动作就是引擎的动作编号（NOOP/LEFT/RIGHT/DOWN/ROTATE/TICK/HARD_DROP），
+# 奖励是这一步的得分增量（来自 clear_lines 的计分），游戏结束时 terminated 为真。
+# gravity_interval 不为空时每执行这么多个动作自动下落一格，与界面中的重力一样。
+#
+# 观测是一个字典，值都是预先分配好的 NumPy 数组：
+#   board       (高, 宽) uint8  已锁定的格子
+#   piece       (4,) int32      当前方块 (类型, 旋转, x, y)
+#   next        (1,) int32      下一个方块类型
+# 可选的特征平面（features）：
+#   heights     (宽,) int32     每列高度
+#   holes       (高, 宽) uint8  空洞（上方有方块的空格子）
+#   piece_mask  (高, 宽) uint8  当前方块占据的格子
+# 每一步都原地更新这些数组并返回同一个字典，不复制棋盘：方块移动只改 piece，
+# 锁定时只写入方块的几个格子，消行时按 board.cleared_rows 把上面的行下移。
+# 需要保留某一步的观测时请自己复制。
+#
+# VectorTetrisEnv 用 BatchTetrisEngine 在一个进程中同时推进很多个环境，
+# 观测数组多一个环境维度；一局结束（或超过 max_steps）的环境在同一步自动重开，
+# 结束时的分数放在 info['final_score'] 中，info['_final_score'] 标记哪些环境结束了。
+#
+# gymnasium 是可选依赖：安装了就继承 gymnasium.Env 并提供 observation_space /
+# action_space，没有安装时接口相同，只是没有这两个属性。
+import random
+
+import numpy as np  # type: ignore
+
+from tetris_batch import MAX_ROTATIONS, BatchTetrisEngine
+from tetris_engine import ACTIONS, GRID_WIDTH, GRID_HEIGHT, TICK, TetrisEngine
+from tetris_pieces import PIECE_COUNT, ROTATIONS
+
+try:
+    import gymnasium  # type: ignore
+    from gymnasium import spaces  # type: ignore
+except ImportError:
+    gymnasium = None
+    spaces = None
+
+FEATURES = ('heights', 'holes', 'piece_mask')
+CELLS_PER_PIECE = 4
+
+
+def _build_cell_tables():
+    # 每种方块每个旋转状态的格子偏移，供向量化环境批量写入 piece_mask
+    rows = np.zeros((PIECE_COUNT, MAX_ROTATIONS, CELLS_PER_PIECE), dtype=np.int64)
+    cols = np.zeros((PIECE_COUNT, MAX_ROTATIONS, CELLS_PER_PIECE), dtype=np.int64)
+    for kind, states in enumerate(ROTATIONS):
+        for rotation in range(MAX_ROTATIONS):
+            # 旋转状态少于 MAX_ROTATIONS 的方块用第0个状态填充，不会被用到
+            state = states[rotation] if rotation < len(states) else states[0]
+            for index, (i, j) in enumerate(state.cells):
+                rows[kind, rotation, index] = i
+                cols[kind, rotation, index] = j
+    return rows, cols
+
+
+CELL_ROWS, CELL_COLS = _build_cell_tables()
+
+
+def hole_plane(board, out):
+    # 空洞 = 从上往下累计出现过方块、自己却是空的格子；board 的最后两维是 (高, 宽)
+    np.maximum.accumulate(board, axis=-2, out=out)
+    np.subtract(out, board, out=out)
+
+
+def column_heights(board):
+    # 每列最上面一个方块到底部的格数，空列为0
+    height = board.shape[-2]
+    return np.where(board.any(axis=-2), height - board.argmax(axis=-2), 0)
+
+
+def _observation_space(width, height, features, count=None):
+    # count 不为空时每个空间多一个环境维度
+    def box(low, high, shape, dtype):
+        shape = shape if count is None else (count,) + shape
+        return spaces.Box(low, high, shape, dtype)
+
+    piece_high = np.array([PIECE_COUNT - 1, MAX_ROTATIONS - 1, width - 1, height - 1], dtype=np.int32)
+    if count is not None:
+        piece_high = np.tile(piece_high, (count, 1))
+    observation = {
+        'board': box(0, 1, (height, width), np.uint8),
+        'piece': spaces.Box(np.zeros_like(piece_high), piece_high, dtype=np.int32),
+        'next': box(0, PIECE_COUNT - 1, (1,), np.int32),
+    }
+    if 'heights' in features:
+        observation['heights'] = box(0, height, (width,), np.int32)
+    if 'holes' in features:
+        observation['holes'] = box(0, 1, (height, width), np.uint8)
+    if 'piece_mask' in features:
+        observation['piece_mask'] = box(0, 1, (height, width), np.uint8)
+    return spaces.Dict(observation)
+
+
+class TetrisEnv(gymnasium.Env if gymnasium is not None else object):
+    metadata = {'render_modes': ['ansi']}
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, features=(), board_type='bit',
+                 randomizer='uniform', gravity_interval=None, max_steps=None, render_mode=None):
+        unknown = set(features) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"未知的特征: {', '.join(sorted(unknown))}")
+        self.features = tuple(features)
+        self.gravity_interval = gravity_interval
+        self.max_steps = max_steps
+        self.render_mode = render_mode
+        self.engine = TetrisEngine(width, height, board_type=board_type, randomizer=randomizer)
+        self.board = np.zeros((height, width), dtype=np.uint8)
+        self.piece = np.zeros(4, dtype=np.int32)
+        self.next = np.zeros(1, dtype=np.int32)
+        self.observation = {'board': self.board, 'piece': self.piece, 'next': self.next}
+        self.heights = self.holes = self.piece_mask = None
+        if 'heights' in features:
+            self.heights = self.observation['heights'] = np.zeros(width, dtype=np.int32)
+        if 'holes' in features:
+            self.holes = self.observation['holes'] = np.zeros((height, width), dtype=np.uint8)
+        if 'piece_mask' in features:
+            self.piece_mask = self.observation['piece_mask'] = np.zeros((height, width), dtype=np.uint8)
+        self.mask_cells = ()  # piece_mask 中当前置1的格子
+        if spaces is not None:
+            self.observation_space = _observation_space(width, height, self.features)
+            self.action_space = spaces.Discrete(len(ACTIONS))
+
+    def reset(self, seed=None, options=None):
+        self.engine.reset(seed)
+        self.actions = 0
+        self.sync_board()
+        return self.observation, self.info()
+
+    def step(self, action):
+        engine = self.engine
+        piece = engine.current_piece
+        pieces = engine.pieces
+        score = engine.score
+        changed = engine.step(action)
+        self.actions += 1
+        if self.gravity_interval and self.actions % self.gravity_interval == 0:
+            changed = engine.step(TICK) or changed
+        if engine.pieces == pieces + 1:
+            # 锁定了一个方块：piece 还是被锁定的那个方块对象，位置就是锁定的位置
+            self.lock(piece)
+        elif engine.pieces != pieces:
+            self.sync_board()
+        elif changed:
+            self.sync_piece()
+        terminated = engine.game_over
+        truncated = not terminated and self.max_steps is not None and self.actions >= self.max_steps
+        return self.observation, engine.score - score, terminated, truncated, self.info()
+
+    def info(self):
+        engine = self.engine
+        return {'score': engine.score, 'lines': engine.lines, 'pieces': engine.pieces}
+
+    def lock(self, piece):
+        board = self.board
+        for i, j in piece.state.cells:
+            board[piece.y + i, piece.x + j] = 1
+        if self.engine.last_cleared:
+            # 从上往下逐行删除：删除一行只会让它上面的行下移，下面的行号不变
+            for row in self.engine.board.cleared_rows:
+                board[1:row + 1] = board[:row]
+                board[0] = 0
+        self.sync_features()
+        self.sync_piece()
+
+    def sync_board(self):
+        # 从棋盘的行掩码重建整个镜像（重开或一步之内锁定了多个方块时）
+        board = self.board
+        width = board.shape[1]
+        for i, mask in enumerate(self.engine.board.row_masks()):
+            board[i] = [mask >> j & 1 for j in range(width)]
+        self.sync_features()
+        self.sync_piece()
+
+    def sync_features(self):
+        if self.heights is not None:
+            self.heights[:] = self.engine.board.heights
+        if self.holes is not None:
+            hole_plane(self.board, self.holes)
+
+    def sync_piece(self):
+        engine = self.engine
+        piece = engine.current_piece
+        encoding = self.piece
+        encoding[0] = piece.kind
+        encoding[1] = piece.rotation
+        encoding[2] = piece.x
+        encoding[3] = piece.y
+        self.next[0] = engine.next_piece.kind
+        mask = self.piece_mask
+        if mask is not None:
+            for cell in self.mask_cells:
+                mask[cell] = 0
+            self.mask_cells = [(piece.y + i, piece.x + j) for i, j in piece.state.cells]
+            for cell in self.mask_cells:
+                mask[cell] = 1
+
+    def render(self):
+        # 'ansi'：文字棋盘，@ 是当前方块
+        piece = self.engine.current_piece
+        piece = set((piece.y + i, piece.x + j) for i, j in piece.state.cells)
+        return '\n'.join(''.join('@' if (i, j) in piece else '#' if cell else '.' for j, cell in enumerate(row))
+                         for i, row in enumerate(self.board))
+
+
+class VectorTetrisEnv:
+    def __init__(self, count, width=GRID_WIDTH, height=GRID_HEIGHT, features=(), randomizer='uniform',
+                 max_steps=None):
+        unknown = set(features) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"未知的特征: {', '.join(sorted(unknown))}")
+        self.count = count
+        self.width = width
+        self.height = height
+        self.features = tuple(features)
+        self.max_steps = max_steps
+        self.randomizer = randomizer
+        self.engine = None
+        self.seed_rng = random.Random()
+        self.columns = np.arange(width, dtype=np.int64)
+        self.board = np.zeros((count, height, width), dtype=np.uint8)
+        self.piece = np.zeros((count, 4), dtype=np.int32)
+        self.next = np.zeros((count, 1), dtype=np.int32)
+        self.observation = {'board': self.board, 'piece': self.piece, 'next': self.next}
+        self.heights = self.holes = self.piece_mask = None
+        if 'heights' in features:
+            self.heights = self.observation['heights'] = np.zeros((count, width), dtype=np.int32)
+        if 'holes' in features:
+            self.holes = self.observation['holes'] = np.zeros((count, height, width), dtype=np.uint8)
+        if 'piece_mask' in features:
+            self.piece_mask = self.observation['piece_mask'] = np.zeros((count, height, width), dtype=np.uint8)
+            self.board_index = np.arange(count)[:, None]
+        if spaces is not None:
+            self.single_observation_space = _observation_space(width, height, self.features)
+            self.single_action_space = spaces.Discrete(len(ACTIONS))
+            self.observation_space = _observation_space(width, height, self.features, count)
+            self.action_space = spaces.MultiDiscrete([len(ACTIONS)] * count)
+
+    def reset(self, seed=None, options=None):
+        # 指定种子时第i个环境使用 seed + i，之后自动重开的环境的种子也由它决定
+        self.seed_rng.seed(seed)
+        seeds = None if seed is None else [seed + i for i in range(self.count)]
+        if self.engine is None:
+            self.engine = BatchTetrisEngine(self.count, self.width, self.height, seeds, self.randomizer)
+        else:
+            self.engine.reset(seeds)
+        everything = np.arange(self.count)
+        self.sync_boards(everything)
+        self.sync_pieces()
+        return self.observation, {}
+
+    def step(self, actions):
+        engine = self.engine
+        score = engine.score.copy()
+        pieces = engine.pieces.copy()
+        engine.step(actions)
+        reward = engine.score - score
+        terminated = engine.game_over.copy()
+        truncated = ~terminated & (engine.steps >= self.max_steps) if self.max_steps is not None \
+            else np.zeros(self.count, dtype=bool)
+        ended = np.flatnonzero(terminated | truncated)
+        info = {}
+        if len(ended):
+            final_score = np.zeros(self.count, dtype=np.int64)
+            final_score[ended] = engine.score[ended]
+            info['final_score'] = final_score
+            info['_final_score'] = terminated | truncated
+            for board in ended:
+                engine.reset_board(board, self.seed_rng.randrange(1 << 32))
+        self.sync_boards(np.flatnonzero((engine.pieces != pieces) | terminated | truncated))
+        self.sync_pieces()
+        return self.observation, reward, terminated, truncated, info
+
+    def sync_boards(self, boards):
+        # 只重新展开锁定过方块（或重开）的棋盘
+        if not len(boards):
+            return
+        rows = self.engine.rows[boards]
+        board = (rows[:, :, None] >> self.columns) & 1
+        self.board[boards] = board
+        if self.heights is not None:
+            self.heights[boards] = column_heights(board)
+        if self.holes is not None:
+            holes = np.empty_like(board)
+            hole_plane(board, holes)
+            self.holes[boards] = holes
+
+    def sync_pieces(self):
+        engine = self.engine
+        piece = self.piece
+        piece[:, 0] = engine.kind
+        piece[:, 1] = engine.rotation
+        piece[:, 2] = engine.x
+        piece[:, 3] = engine.y
+        self.next[:, 0] = engine.next_kind
+        mask = self.piece_mask
+        if mask is not None:
+            mask[:] = 0
+            mask[self.board_index,
+                 engine.y[:, None] + CELL_ROWS[engine.kind, engine.rotation],
+                 engine.x[:, None] + CELL_COLS[engine.kind, engine.rotation]] = 1
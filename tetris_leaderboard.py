@@ -0,0 +1,49 @@
+# 排行榜：按最高分维护一个有序索引
+#
+# keys 是按 (-最高分, 用户ID) 排好序的列表，分数更新时用二分查找删除旧位置
+# 并插入新位置；前K名直接切片，某个玩家的名次是一次二分查找，
+# 不需要重新扫描全部用户。
+from bisect import bisect_left, insort
+
+
+class Leaderboard:
+    def __init__(self, users=None):
+        self.scores = {}  # 用户ID -> 最高分
+        self.keys = []
+        if users:
+            self.rebuild(users)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def rebuild(self, users):
+        # 只统计玩过游戏的用户
+        self.scores = {user_id: user["highest_score"] for user_id, user in users.items()
+                       if user["game_count"] > 0}
+        self.keys = sorted((-score, user_id) for user_id, score in self.scores.items())
+
+    def update(self, user_id, score):
+        old_score = self.scores.get(user_id)
+        if old_score == score:
+            return
+        if old_score is not None:
+            index = bisect_left(self.keys, (-old_score, user_id))
+            del self.keys[index]
+        self.scores[user_id] = score
+        insort(self.keys, (-score, user_id))
+
+    def remove(self, user_id):
+        score = self.scores.pop(user_id, None)
+        if score is not None:
+            del self.keys[bisect_left(self.keys, (-score, user_id))]
+
+    def top(self, k):
+        # 返回前k名的 (用户ID, 最高分)
+        return [(user_id, -neg_score) for neg_score, user_id in self.keys[:k]]
+
+    def rank(self, user_id):
+        # 名次从1开始，同分的玩家名次相同；没有成绩的用户返回None
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self.keys, (-score,)) + 1
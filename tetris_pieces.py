@@ -0,0 +1,100 @@
+# 方块定义和预计算的旋转表（不依赖pygame）
+#
+# 导入时为每种方块生成所有旋转状态，每个状态包含：
+#   cells   方块格子相对左上角的偏移 (行, 列)
+#   width / height  包围盒大小
+#   top / bottom  每一列最上面 / 最下面一个格子所在的行（用于维护列高和计算落点）
+#   masks   每一行的位掩码（第j列对应第j位），供位棋盘使用
+#   nibbles 每一行按4位一格展开的掩码，乘以方块编号即得到颜色旁表的值
+# 运行时方块只是 (类型, 旋转序号, x, y)，旋转和生成都只是查表
+from collections import namedtuple
+
+# 方块形状
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1], [1, 1]],  # O
+    [[1, 1, 1], [0, 1, 0]],  # T
+    [[1, 1, 1], [1, 0, 0]],  # L
+    [[1, 1, 1], [0, 0, 1]],  # J
+    [[1, 1, 0], [0, 1, 1]],  # S
+    [[0, 1, 1], [1, 1, 0]]   # Z
+]
+
+# 与SHAPES一一对应的颜色
+COLORS = [
+    (0, 255, 255),  # 青色
+    (255, 255, 0),  # 黄色
+    (255, 0, 255),  # 品红
+    (255, 165, 0),  # 橙色
+    (0, 0, 255),  # 蓝色
+    (0, 255, 0),  # 绿色
+    (255, 0, 0)  # 红色
+]
+
+PIECE_COUNT = len(SHAPES)
+
+PieceState = namedtuple('PieceState', 'cells width height top bottom masks nibbles')
+
+
+def _rotate(shape):
+    # 与原来按上键时的旋转方式一致（顺时针）
+    return tuple(zip(*reversed(shape)))
+
+
+def _build_state(shape):
+    height = len(shape)
+    width = len(shape[0])
+    cells = tuple((i, j) for i in range(height) for j in range(width) if shape[i][j])
+    top = tuple(min(i for i, j in cells if j == col) for col in range(width))
+    bottom = tuple(max(i for i, j in cells if j == col) for col in range(width))
+    masks = tuple(sum(1 << j for j in range(width) if shape[i][j]) for i in range(height))
+    nibbles = tuple(sum(1 << (4 * j) for j in range(width) if shape[i][j]) for i in range(height))
+    return PieceState(cells, width, height, top, bottom, masks, nibbles)
+
+
+def _build_rotations(shape):
+    first = tuple(map(tuple, shape))
+    states = []
+    current = first
+    while True:
+        states.append(_build_state(current))
+        current = _rotate(current)
+        if current == first:
+            break
+    return tuple(states)
+
+
+# ROTATIONS[类型][旋转序号] -> PieceState
+ROTATIONS = tuple(_build_rotations(shape) for shape in SHAPES)
+# NEXT_ROTATION[类型][旋转序号] -> 顺时针旋转后的序号
+NEXT_ROTATION = tuple(tuple((r + 1) % len(states) for r in range(len(states)))
+                      for states in ROTATIONS)
+
+
+class Piece:
+    __slots__ = ('kind', 'rotation', 'x', 'y')
+
+    def __init__(self, kind, rotation=0, x=0, y=0):
+        self.kind = kind
+        self.rotation = rotation
+        self.x = x
+        self.y = y
+
+    @property
+    def state(self):
+        return ROTATIONS[self.kind][self.rotation]
+
+    @property
+    def color(self):
+        return COLORS[self.kind]
+
+    def next_rotation(self):
+        return NEXT_ROTATION[self.kind][self.rotation]
+
+    def copy(self):
+        return Piece(self.kind, self.rotation, self.x, self.y)
+
+
+def spawn_piece(kind, board_width):
+    # 新方块出现在顶部居中
+    return Piece(kind, 0, board_width // 2 - ROTATIONS[kind][0].width // 2, 0)
@@ -0,0 +1,99 @@
+# 每帧耗时统计（不依赖pygame）
+#
+# 一帧分成几段计时：
+#   events   处理输入事件
+#   logic    游戏逻辑（引擎的移动、合并、消行）
+#   draw     在后台缓冲区中绘制
+#   present  提交到窗口（display.flip / display.update）
+# 用 lap(段名) 把距上一次计时以来的时间记到该段，空闲等待用 skip() 跳过不计。
+# 最近 WINDOW 帧保存在环形缓冲区中，按需计算 p50/p95/p99；
+# 一帧的总耗时超过帧预算（60帧每秒）记为掉帧。可以把每帧数据逐行写入CSV文件，
+# 每 CSV_FLUSH_INTERVAL 帧写到磁盘一次，运行中也可以查看。
+# 不开启时界面层不创建统计对象，计时点只剩一次 None 判断。
+import csv
+import time
+from collections import deque
+
+SECTIONS = ('events', 'logic', 'draw', 'present')
+WINDOW = 600  # 保留最近多少帧用于计算百分位数
+FRAME_BUDGET = 1000 / 60  # 毫秒
+PERCENTILES = (50, 95, 99)
+CSV_FLUSH_INTERVAL = 60  # 每隔多少帧把CSV写到文件，程序崩溃时最多丢失这么多帧
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, len(sorted_values) * p // 100)]
+
+
+class FrameProfiler:
+    def __init__(self, window=WINDOW, budget=FRAME_BUDGET, csv_path=None, flush_interval=CSV_FLUSH_INTERVAL):
+        self.budget = budget
+        self.history = {name: deque(maxlen=window) for name in SECTIONS + ('total',)}
+        self.current = dict.fromkeys(SECTIONS, 0.0)
+        self.frames = 0
+        self.dropped = 0
+        self.last = time.perf_counter()
+        self.csv_file = None
+        self.csv_writer = None
+        self.flush_interval = flush_interval
+        if csv_path:
+            self.csv_file = open(csv_path, 'w', newline='', encoding='utf-8')
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(('frame',) + tuple(f'{name}_ms' for name in SECTIONS + ('total',)) +
+                                     ('dropped',))
+
+    def skip(self):
+        # 从现在开始重新计时，之前的时间（例如等待事件）不计入任何一段
+        self.last = time.perf_counter()
+
+    def lap(self, section):
+        now = time.perf_counter()
+        self.current[section] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        # 结束一帧：保存各段耗时（毫秒），判断是否掉帧
+        current = self.current
+        total = 0.0
+        row = [self.frames]
+        for name in SECTIONS:
+            ms = current[name] * 1000
+            current[name] = 0.0
+            self.history[name].append(ms)
+            total += ms
+            row.append(f'{ms:.3f}')
+        self.history['total'].append(total)
+        dropped = total > self.budget
+        if dropped:
+            self.dropped += 1
+        self.frames += 1
+        if self.csv_writer:
+            row.append(f'{total:.3f}')
+            row.append(int(dropped))
+            self.csv_writer.writerow(row)
+            if self.frames % self.flush_interval == 0:
+                self.csv_file.flush()
+
+    def summary(self):
+        # {段名: (p50, p95, p99)}，单位毫秒
+        result = {}
+        for name, values in self.history.items():
+            ordered = sorted(values)
+            result[name] = tuple(percentile(ordered, p) for p in PERCENTILES)
+        return result
+
+    def report_lines(self):
+        # 叠加层和命令行使用的文字
+        lines = [f"frames {self.frames}  dropped {self.dropped}  (budget {self.budget:.1f}ms)",
+                 "ms        p50    p95    p99"]
+        for name, values in self.summary().items():
+            lines.append(f"{name:<8}" + "".join(f"{value:7.2f}" for value in values))
+        return lines
+
+    def close(self):
+        if self.csv_file:
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
@@ -0,0 +1,95 @@
+# 可复现的方块序列
+#
+# 每个序列有明确的种子和随机方式，同一 (种子, 随机方式) 总是得到同样的方块顺序：
+#   uniform  每次从7种方块中等概率选一个（原来的方式）
+#   bag7     每7个方块为一袋，袋内7种方块各出现一次，顺序随机
+# 方块按块预先生成，取下一个方块和查看后面N个方块都不需要再调用随机数。
+# 缓冲区列表生成之后不再修改（补充时总是换成新的列表），所以快照只需记下
+# (缓冲区, 位置, 生成这个缓冲区之后的随机数状态)，都是共用的引用。
+import random
+
+from tetris_pieces import PIECE_COUNT
+
+CHUNK_SIZE = 1024  # 每次预生成的方块数量
+KINDS = tuple(range(PIECE_COUNT))
+
+
+def _uniform_chunk(rng, size):
+    return rng.choices(KINDS, k=size)
+
+
+def _bag7_chunk(rng, size):
+    chunk = []
+    while len(chunk) < size:
+        # 每袋都从同样的初始顺序洗牌，序列才不受分块大小影响
+        bag = list(KINDS)
+        rng.shuffle(bag)
+        chunk.extend(bag)
+    return chunk
+
+
+RANDOMIZERS = {
+    'uniform': _uniform_chunk,
+    'bag7': _bag7_chunk,
+}
+
+
+class PieceSequence:
+    def __init__(self, seed=None, randomizer='uniform', chunk_size=CHUNK_SIZE):
+        if randomizer not in RANDOMIZERS:
+            raise ValueError(f"未知的随机方式: {randomizer}")
+        if randomizer == 'bag7':
+            # 一块必须是整袋，否则下一块会打乱袋子的边界
+            chunk_size = max(PIECE_COUNT, chunk_size - chunk_size % PIECE_COUNT)
+        self.seed = seed
+        self.randomizer = randomizer
+        self.chunk_size = chunk_size
+        self.generate = RANDOMIZERS[randomizer]
+        self.rng = random.Random(seed)
+        self.buffer = []
+        self.pos = 0
+        self.rng_buffer = None  # rng_state 对应的缓冲区
+        self.rng_state = None
+
+    def ensure(self, count):
+        # 保证缓冲区中至少还有count个未取出的方块
+        if len(self.buffer) - self.pos >= count:
+            return
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        while len(self.buffer) < count:
+            self.buffer.extend(self.generate(self.rng, self.chunk_size))
+
+    def snapshot(self):
+        # 随机数只在生成缓冲区时使用，此刻的状态就是生成当前缓冲区之后的状态
+        if self.rng_buffer is not self.buffer:
+            self.rng_state = self.rng.getstate()
+            self.rng_buffer = self.buffer
+        return self.buffer, self.pos, self.rng_state
+
+    def restore(self, snapshot):
+        buffer, self.pos, rng_state = snapshot
+        if buffer is not self.buffer:
+            self.buffer = buffer
+            self.rng.setstate(rng_state)
+            self.rng_buffer = buffer
+            self.rng_state = rng_state
+
+    def next(self):
+        if self.pos >= len(self.buffer):
+            self.ensure(1)
+        kind = self.buffer[self.pos]
+        self.pos += 1
+        return kind
+
+    def take(self, count):
+        # 一次取出count个方块
+        self.ensure(count)
+        kinds = self.buffer[self.pos:self.pos + count]
+        self.pos += count
+        return kinds
+
+    def peek(self, count):
+        # 查看接下来的count个方块，不会取出
+        self.ensure(count)
+        return self.buffer[self.pos:self.pos + count]
@@ -0,0 +1,185 @@
+# 紧凑的二进制录像
+#
+# 文件格式（小端）：
+#   文件头  魔数 b'TRPL'、版本(1字节)、随机方式(1字节)、棋盘宽(1字节)、棋盘高(2字节)、种子(8字节)
+#           随机方式的编号是格式的一部分（RANDOMIZER_CODES），只能追加，不能改动已有的编号
+#   记录    每个输入一个字节：高3位是动作编号，低5位是距上一个输入的帧数（1帧 = 1/60秒）；
+#           帧数 >= 31 时低5位写31，后面再跟一个变长整数表示超出的部分
+#   结束    动作编号7，表示录像完整结束
+# 只要有种子和输入序列，就可以用引擎重新模拟出整局游戏。读取是流式的，
+# 很长的录像也不需要一次读入内存。
+#
+#   python tetris_replay.py game.trp      无界面以最快速度重放并输出结果
+import argparse
+import struct
+import sys
+import time
+
+from tetris_engine import TetrisEngine, ACTIONS
+
+MAGIC = b'TRPL'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBHQ')
+FRAME_RATE = 60  # 录像中帧数的单位
+END = 7
+DELTA_BITS = 5
+DELTA_ESCAPE = (1 << DELTA_BITS) - 1
+SEED_LIMIT = 1 << 64  # 种子以8字节无符号整数保存
+# 版本1的随机方式编号（沿用最早按名字排序得到的编号，已有的录像依赖这些值），
+# 与 tetris_random.RANDOMIZERS 的内容无关
+RANDOMIZER_CODES = {
+    'bag7': 0,
+    'uniform': 1,
+}
+RANDOMIZER_NAMES = {code: name for name, code in RANDOMIZER_CODES.items()}
+
+
+class ReplayError(Exception):
+    pass
+
+
+def _write_varint(stream, value):
+    while value >= 0x80:
+        stream.write(bytes((value & 0x7F | 0x80,)))
+        value >>= 7
+    stream.write(bytes((value,)))
+
+
+def _read_varint(stream):
+    value = 0
+    shift = 0
+    while True:
+        data = stream.read(1)
+        if not data:
+            raise ReplayError("录像文件不完整")
+        value |= (data[0] & 0x7F) << shift
+        if data[0] < 0x80:
+            return value
+        shift += 7
+
+
+def pack_header(seed, randomizer, width, height):
+    # 在打开文件、开始游戏之前检查，不能保存的参数抛出 ReplayError
+    if randomizer not in RANDOMIZER_CODES:
+        raise ReplayError(f"录像不支持的随机方式: {randomizer}")
+    if not 0 <= seed < SEED_LIMIT:
+        raise ReplayError(f"种子超出录像支持的范围（0 到 2**64-1）: {seed}")
+    if not 0 < width < 256 or not 0 < height < 65536:
+        raise ReplayError(f"录像不支持的棋盘大小: {width}x{height}")
+    return HEADER.pack(MAGIC, VERSION, RANDOMIZER_CODES[randomizer], width, height, seed)
+
+
+class ReplayWriter:
+    def __init__(self, stream, seed, randomizer, width, height):
+        header = pack_header(seed, randomizer, width, height)
+        self.stream = stream
+        self.last_frame = 0
+        stream.write(header)
+
+    def record(self, frame, action):
+        # frame 是从开局算起的帧数，必须单调不减
+        delta = max(0, frame - self.last_frame)
+        self.last_frame = frame
+        if delta < DELTA_ESCAPE:
+            self.stream.write(bytes((action << DELTA_BITS | delta,)))
+        else:
+            self.stream.write(bytes((action << DELTA_BITS | DELTA_ESCAPE,)))
+            _write_varint(self.stream, delta - DELTA_ESCAPE)
+
+    def close(self):
+        self.stream.write(bytes((END << DELTA_BITS,)))
+        self.stream.close()
+
+
+class ReplayReader:
+    def __init__(self, stream):
+        self.stream = stream
+        header = stream.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ReplayError("录像文件头不完整")
+        magic, self.version, randomizer, self.width, self.height, self.seed = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ReplayError("不是录像文件")
+        if self.version != VERSION:
+            raise ReplayError(f"不支持的录像版本: {self.version}")
+        if randomizer not in RANDOMIZER_NAMES:
+            raise ReplayError(f"未知的随机方式编号: {randomizer}")
+        self.randomizer = RANDOMIZER_NAMES[randomizer]
+        self.complete = False  # 读到结束标记后为True
+
+    def __iter__(self):
+        # 逐个返回 (帧数, 动作)
+        frame = 0
+        read = self.stream.read
+        while True:
+            data = read(1)
+            if not data:
+                return
+            action = data[0] >> DELTA_BITS
+            if action == END:
+                self.complete = True
+                return
+            delta = data[0] & DELTA_ESCAPE
+            if delta == DELTA_ESCAPE:
+                delta += _read_varint(self.stream)
+            frame += delta
+            if action not in ACTIONS:
+                raise ReplayError(f"未知的动作编号: {action}")
+            yield frame, action
+
+    def close(self):
+        self.stream.close()
+
+    def make_engine(self, board_type='bit'):
+        return TetrisEngine(self.width, self.height, board_type, self.seed, self.randomizer)
+
+
+def open_replay(path):
+    stream = open(path, 'rb')
+    try:
+        return ReplayReader(stream)
+    except ReplayError:
+        stream.close()
+        raise
+
+
+def record_replay(path, engine):
+    # 先检查文件头，参数不能保存时不会留下一个空文件
+    pack_header(engine.seed, engine.randomizer, engine.width, engine.height)
+    return ReplayWriter(open(path, 'wb'), engine.seed, engine.randomizer, engine.width, engine.height)
+
+
+def simulate(reader, board_type='bit'):
+    # 无界面以最快速度重放，返回结束时的引擎
+    engine = reader.make_engine(board_type)
+    step = engine.step
+    for _, action in reader:
+        step(action)
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面重放录像")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    try:
+        reader = open_replay(args.path)
+        try:
+            start = time.perf_counter()
+            engine = simulate(reader)
+            elapsed = time.perf_counter() - start
+        finally:
+            reader.close()
+    except (OSError, ReplayError) as e:
+        print(f"无法重放 {args.path}: {e}", file=sys.stderr)
+        return 1
+    print(f"seed={reader.seed} randomizer={reader.randomizer} board={reader.width}x{reader.height}"
+          f"{'' if reader.complete else ' (incomplete)'}")
+    print(f"score={engine.score} lines={engine.lines} pieces={engine.pieces} "
+          f"steps={engine.steps} game_over={engine.game_over}")
+    print(f"replayed in {elapsed * 1000:.1f} ms ({engine.steps / max(elapsed, 1e-9):,.0f} steps/sec)")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# 多进程自动对局：在进程池中批量运行带种子的无界面游戏
+#
+#   python tetris_selfplay.py --games 100000 --workers 8 --policy random
+#   python tetris_selfplay.py --games 1000 --policy ai
+#   python tetris_selfplay.py --policy mymodule:my_policy --output results.jsonl
+#
+# 策略是一个可调用对象 policy(engine, rng) -> action，内置策略按名字选择，
+# 也可以用 "模块:函数" 指定自定义策略（工作进程中按名字导入，无需可序列化）。
+# 工作按块分配给工作进程，每块结果返回后立即累计统计并可逐局写入文件，
+# 不会在内存中保存全部结果。
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from tetris_ai import ai_policy
+from tetris_board import BOARD_TYPES
+from tetris_engine import TetrisEngine, LEFT, RIGHT, DOWN, ROTATE, TICK
+from tetris_random import RANDOMIZERS
+
+RANDOM_ACTIONS = (LEFT, RIGHT, ROTATE, DOWN, TICK, TICK)
+
+
+def random_policy(engine, rng):
+    return rng.choice(RANDOM_ACTIONS)
+
+
+POLICIES = {
+    'random': random_policy,
+    'ai': ai_policy,
+}
+
+
+def load_policy(spec):
+    if spec in POLICIES:
+        return POLICIES[spec]
+    module_name, _, attr = spec.partition(':')
+    if not attr:
+        raise ValueError(f"未知策略: {spec}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def play_game(engine, policy, rng, max_steps=None):
+    # 用策略把一局游戏玩到结束（或达到步数上限）
+    step = engine.step
+    while not engine.game_over:
+        if max_steps is not None and engine.steps >= max_steps:
+            break
+        step(policy(engine, rng))
+
+
+def run_chunk(first_seed, count, policy_spec, board_type, max_steps, randomizer):
+    # 在工作进程中运行一块连续种子的游戏，返回每局的结果
+    policy = load_policy(policy_spec)
+    engine = TetrisEngine(board_type=board_type, randomizer=randomizer)
+    results = []
+    for seed in range(first_seed, first_seed + count):
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        engine.reset(seed)
+        play_game(engine, policy, random.Random(seed), max_steps)
+        results.append((seed, engine.score, engine.lines, engine.pieces, engine.steps,
+                        time.perf_counter() - start, time.process_time() - cpu_start))
+    return results
+
+
+class SelfPlayStats:
+    # 增量统计，不保存单局结果
+    def __init__(self):
+        self.games = 0
+        self.total_score = 0
+        self.total_lines = 0
+        self.total_pieces = 0
+        self.total_steps = 0
+        self.cpu_time = 0.0  # 所有工作进程用于对局的CPU时间之和
+        self.best_score = None
+        self.worst_score = None
+
+    def add(self, score, lines, pieces, steps, duration, cpu_time):
+        self.games += 1
+        self.total_score += score
+        self.total_lines += lines
+        self.total_pieces += pieces
+        self.total_steps += steps
+        self.cpu_time += cpu_time
+        if self.best_score is None or score > self.best_score:
+            self.best_score = score
+        if self.worst_score is None or score < self.worst_score:
+            self.worst_score = score
+
+    def report(self, wall_time, workers, baseline=None):
+        games = max(self.games, 1)
+        wall_time = max(wall_time, 1e-9)
+        # CPU利用率 = 工作进程的CPU时间 / (墙钟时间 × 进程数)，只说明进程有没有闲着
+        utilization = self.cpu_time / (wall_time * workers)
+        lines = [f"games={self.games} workers={workers} time={wall_time:.2f}s",
+                 f"games/sec: {self.games / wall_time:,.1f}  moves/sec: {self.total_steps / wall_time:,.0f}",
+                 f"score: avg={self.total_score / games:.1f} best={self.best_score} worst={self.worst_score}",
+                 f"lines: avg={self.total_lines / games:.2f}  pieces: avg={self.total_pieces / games:.1f}",
+                 f"cpu utilization: {utilization:.1%}"]
+        if baseline:
+            # 扩展效率 = N个进程的吞吐量 / (N × 1个进程的吞吐量)，baseline 为1个进程实测的 moves/sec
+            efficiency = self.total_steps / wall_time / (workers * baseline)
+            lines.append(f"scaling efficiency: {efficiency:.1%} (1 worker: {baseline:,.0f} moves/sec)")
+        return "\n".join(lines)
+
+
+def run_selfplay(games, workers, policy_spec, first_seed=0, chunk_size=None,
+                 board_type='bit', max_steps=None, on_result=None, randomizer='uniform'):
+    # 按块提交任务，同时在途的块数有限，结果到达后立即累计
+    load_policy(policy_spec)  # 尽早发现无效的策略
+    if chunk_size is None:
+        chunk_size = max(1, min(256, games // (workers * 8) or 1))
+    stats = SelfPlayStats()
+    chunks = ((seed, min(chunk_size, first_seed + games - seed))
+              for seed in range(first_seed, first_seed + games, chunk_size))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for seed, count in chunks:
+            pending.add(pool.submit(run_chunk, seed, count, policy_spec, board_type, max_steps, randomizer))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done, stats, on_result)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            _collect(done, stats, on_result)
+    return stats, time.perf_counter() - start
+
+
+def _collect(done, stats, on_result):
+    for future in done:
+        for result in future.result():
+            stats.add(*result[1:])
+            if on_result:
+                on_result(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程自动对局")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--policy", default="random", help="内置策略名或 模块:函数")
+    parser.add_argument("--seed", type=int, default=0, help="第一局的种子，之后依次加一")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--board", choices=sorted(BOARD_TYPES), default="bit")
+    parser.add_argument("--max-steps", type=int, default=None, help="每局最多的动作数")
+    parser.add_argument("--randomizer", choices=sorted(RANDOMIZERS), default="uniform")
+    parser.add_argument("--output", help="逐局写入结果的JSON Lines文件")
+    parser.add_argument("--baseline-games", type=int, default=None,
+                        help="先用1个工作进程跑这么多局测量扩展效率（默认 games/workers，0 表示不测）")
+    args = parser.parse_args()
+
+    baseline = None
+    baseline_games = args.games // args.workers if args.baseline_games is None else args.baseline_games
+    if args.workers > 1 and baseline_games > 0:
+        # 同样的种子、同样经过进程池，只是只有一个工作进程
+        baseline_stats, baseline_time = run_selfplay(baseline_games, 1, args.policy, args.seed,
+                                                     args.chunk_size, args.board, args.max_steps,
+                                                     None, args.randomizer)
+        baseline = baseline_stats.total_steps / max(baseline_time, 1e-9)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+
+    def write_result(result):
+        seed, score, lines, pieces, steps, duration, _ = result
+        output.write(json.dumps({"seed": seed, "score": score, "lines": lines, "pieces": pieces,
+                                 "steps": steps, "duration": round(duration, 6)}) + "\n")
+
+    try:
+        stats, wall_time = run_selfplay(args.games, args.workers, args.policy, args.seed,
+                                        args.chunk_size, args.board, args.max_steps,
+                                        write_result if output else None, args.randomizer)
+    finally:
+        if output:
+            output.close()
+    print(stats.report(wall_time, args.workers, baseline))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
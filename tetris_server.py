@@ -0,0 +1,334 @@
+# 多人游戏服务器：在一个asyncio事件循环中同时运行很多局由服务器裁决的游戏（不依赖pygame）
+#
+#   python tetris_server.py --port 7777
+#   python tetris_server.py --unix /tmp/tetris.sock
+#
+# 每个连接使用一行一条的文本协议（UTF-8，以换行结束）：
+#   客户端发送                     服务器回复
+#   REGISTER <用户名> <密码>       OK REGISTER            | ERR <原因>
+#   LOGIN <用户名> <密码>          OK LOGIN <用户ID>      | ERR <原因>
+#   START [种子]                   OK START <种子> <当前方块> <下一个方块>   | ERR <原因>
+#   <序号> <动作>                  ACK <序号> <0|1>       1 表示状态发生了变化
+#   WATCH <用户名>                 OK WATCH               | ERR <原因>
+#   QUIT                           关闭连接
+# 动作为 left / right / down / rotate / drop。服务器还会主动发送：
+#   PIECE <当前方块> <下一个方块> <分数> <行数>    方块锁定、换上新方块之后
+#   OVER <分数> <行数>                             游戏结束，成绩已经记录
+# WATCH 之后连接变成观战连接：服务器只发送 tetris_stream 格式的状态帧
+# （每帧前面有长度），先是一个关键帧，之后每次状态变化一个增量帧。
+# 一局游戏的每一帧只编码一次，再写给所有观战者；没有观战者时不编码。
+# 跟不上的观战者（发送缓冲区超过 SPECTATOR_BUFFER_LIMIT）会被断开。
+#
+# 规则全部由 TetrisEngine 执行，客户端只提交输入。重力不需要每局一个任务：
+# 每局在事件循环上挂一个 call_later 定时器，到时执行一次 TICK 再挂下一个；
+# 软降和硬降与界面一样重新开始计时。输入在 data_received 中同步处理，
+# 同一次收到的多条输入的回复合并成一次写入。
+import argparse
+import asyncio
+import signal
+
+from tetris_board import BOARD_TYPES
+from tetris_engine import TetrisEngine, LEFT, RIGHT, DOWN, ROTATE, TICK, HARD_DROP
+from tetris_random import RANDOMIZERS
+from tetris_stream import StreamEncoder, pack_frame
+from tetris_users import UserManager
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+FALL_INTERVAL = 0.5  # 秒，与界面的下落速度相同
+MAX_LINE = 1024  # 一行命令的最大长度，超过则断开连接
+BACKLOG = 1024  # 同时发起大量连接时不至于被拒绝
+SPECTATOR_BUFFER_LIMIT = 64 * 1024  # 字节
+
+INPUT_ACTIONS = {
+    'left': LEFT,
+    'right': RIGHT,
+    'down': DOWN,
+    'rotate': ROTATE,
+    'drop': HARD_DROP,
+}
+
+
+def parse_seed(text):
+    # 种子是非负整数，其它内容返回None
+    try:
+        seed = int(text)
+    except ValueError:
+        return None
+    return seed if seed >= 0 else None
+
+
+class TetrisServer:
+    def __init__(self, user_manager, fall_interval=FALL_INTERVAL, board_type='auto', randomizer='uniform'):
+        self.user_manager = user_manager
+        self.fall_interval = fall_interval
+        self.board_type = board_type
+        self.randomizer = randomizer
+        self.sessions = set()
+        self.players = {}  # 用户ID -> 最近登录的会话，供观战者查找
+        self.active_games = 0
+        self.games_finished = 0
+        self.inputs = 0
+
+    def protocol(self):
+        # 传给 create_server 的协议工厂，每个连接一个会话
+        return GameSession(self)
+
+    def close_sessions(self):
+        for session in list(self.sessions):
+            session.transport.close()
+
+
+class GameSession(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = b''
+        self.outbox = []
+        self.user_id = None
+        self.engine = None
+        self.timer = None
+        self.encoder = None
+        self.spectators = set()
+        self.watching = None  # 观战连接正在观看的会话
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_event_loop()
+        self.server.sessions.add(self)
+
+    def connection_lost(self, exc):
+        # 中途断开也算一局结束，与界面中途退出时一样记录成绩
+        if self.engine is not None and not self.engine.game_over:
+            self.finish()
+            self.broadcast()
+        self.outbox = []
+        server = self.server
+        server.sessions.discard(self)
+        if self.user_id is not None and server.players.get(self.user_id) is self:
+            del server.players[self.user_id]
+        for spectator in list(self.spectators):
+            spectator.transport.close()
+        if self.watching is not None:
+            self.watching.spectators.discard(self)
+
+    def data_received(self, data):
+        self.buffer += data
+        lines = self.buffer.split(b'\n')
+        self.buffer = lines.pop()
+        # 每一行（包括还没收完的最后一行）都不能超过 MAX_LINE，否则断开连接
+        for line in lines:
+            if len(line) > MAX_LINE:
+                self.buffer = b''
+                self.flush()
+                self.transport.close()
+                return
+            words = line.decode('utf-8', 'replace').split()
+            if words:
+                self.handle(words)
+        self.flush()
+        if len(self.buffer) > MAX_LINE:
+            self.buffer = b''
+            self.transport.close()
+
+    def send(self, line):
+        self.outbox.append(line)
+
+    def flush(self):
+        if self.outbox and not self.transport.is_closing():
+            self.outbox.append('')
+            self.transport.write('\n'.join(self.outbox).encode('utf-8'))
+        self.outbox = []
+
+    def handle(self, words):
+        command = words[0]
+        if self.watching is not None:
+            # 观战连接只接受 QUIT
+            if command == 'QUIT':
+                self.transport.close()
+        elif command.isdigit():
+            self.handle_input(command, words[1:])
+        elif command == 'LOGIN' and len(words) == 3:
+            if self.engine is not None and not self.engine.game_over:
+                # 游戏中换账号会把这一局的成绩记到别人名下
+                self.send("ERR 游戏中不能重新登录")
+                return
+            success, message = self.server.user_manager.login(words[1], words[2])
+            if success:
+                self.user_id = self.server.user_manager.username_index[words[1]]
+                self.server.players[self.user_id] = self
+                self.send(f"OK LOGIN {self.user_id}")
+            else:
+                self.send(f"ERR {message}")
+        elif command == 'REGISTER' and len(words) == 3:
+            success, message = self.server.user_manager.register_user(words[1], words[2])
+            self.send("OK REGISTER" if success else f"ERR {message}")
+        elif command == 'START' and len(words) <= 2:
+            seed = parse_seed(words[1]) if len(words) == 2 else None
+            if len(words) == 2 and seed is None:
+                self.send(f"ERR 无效的种子: {words[1]}")
+            else:
+                self.start(seed)
+        elif command == 'WATCH' and len(words) == 2:
+            self.watch(words[1])
+        elif command == 'QUIT':
+            self.flush()
+            self.transport.close()
+        else:
+            self.send(f"ERR 未知命令: {command}")
+
+    def start(self, seed):
+        if self.user_id is None:
+            self.send("ERR 请先登录")
+            return
+        if self.engine is not None and not self.engine.game_over:
+            self.send("ERR 游戏已经开始")
+            return
+        server = self.server
+        if self.engine is None:
+            self.engine = TetrisEngine(board_type=server.board_type, seed=seed, randomizer=server.randomizer)
+        else:
+            self.engine.reset(seed)
+        server.active_games += 1
+        engine = self.engine
+        self.send(f"OK START {engine.seed} {engine.current_piece.kind} {engine.next_piece.kind}")
+        self.schedule_fall()
+        if self.spectators:
+            # 新的一局从关键帧开始
+            if self.encoder is None:
+                self.encoder = StreamEncoder(engine)
+            self.write_spectators(pack_frame(self.encoder.keyframe()))
+
+    def watch(self, username):
+        user_id = self.server.user_manager.username_index.get(username)
+        session = self.server.players.get(user_id)
+        if session is None or session is self:
+            self.send("ERR 该玩家不在线")
+            return
+        if self.engine is not None and not self.engine.game_over:
+            self.send("ERR 游戏中不能观战")
+            return
+        self.send("OK WATCH")
+        self.flush()
+        self.watching = session
+        session.spectators.add(self)
+        if session.engine is not None:
+            # 新加入的观战者先收到当前状态的关键帧
+            if session.encoder is None:
+                session.encoder = StreamEncoder(session.engine)
+            self.transport.write(pack_frame(session.encoder.keyframe()))
+
+    def broadcast(self):
+        # 把自上一帧以来的变化编码一次，发给所有观战者
+        if not self.spectators or self.engine is None:
+            return
+        if self.encoder is None:
+            self.encoder = StreamEncoder(self.engine)
+        frame = self.encoder.encode()
+        if frame is not None:
+            self.write_spectators(pack_frame(frame))
+
+    def write_spectators(self, data):
+        for spectator in list(self.spectators):
+            transport = spectator.transport
+            if transport.get_write_buffer_size() > SPECTATOR_BUFFER_LIMIT:
+                transport.close()
+            else:
+                transport.write(data)
+
+    def schedule_fall(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = self.loop.call_later(self.server.fall_interval, self.fall)
+
+    def handle_input(self, sequence, words):
+        action = INPUT_ACTIONS.get(words[0]) if len(words) == 1 else None
+        if action is None:
+            self.send(f"ERR 未知动作: {' '.join(words)}")
+            return
+        engine = self.engine
+        if engine is None or engine.game_over:
+            self.send("ERR 游戏没有开始")
+            return
+        self.server.inputs += 1
+        pieces = engine.pieces
+        changed = engine.step(action)
+        self.send(f"ACK {sequence} {int(changed)}")
+        if changed:
+            if action in (DOWN, HARD_DROP) and not engine.game_over:
+                self.schedule_fall()
+            self.after_step(pieces)
+
+    def fall(self):
+        # 重力定时器：下落一格，落不下去则锁定
+        self.timer = None
+        engine = self.engine
+        pieces = engine.pieces
+        engine.step(TICK)
+        self.after_step(pieces)
+        if not engine.game_over:
+            self.schedule_fall()
+        self.flush()
+
+    def after_step(self, pieces):
+        engine = self.engine
+        if engine.game_over:
+            self.finish()
+            self.send(f"OVER {engine.score} {engine.lines}")
+        elif engine.pieces != pieces:
+            self.send(f"PIECE {engine.current_piece.kind} {engine.next_piece.kind} {engine.score} {engine.lines}")
+        self.broadcast()
+
+    def finish(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.engine.game_over = True
+        server = self.server
+        server.active_games -= 1
+        server.games_finished += 1
+        server.user_manager.update_user_stats(self.engine.score, self.user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="俄罗斯方块多人游戏服务器")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="监听Unix套接字而不是TCP端口")
+    parser.add_argument("--fall-interval", type=float, default=FALL_INTERVAL, help="重力下落间隔（秒）")
+    parser.add_argument("--board", choices=sorted(BOARD_TYPES) + ['auto'], default='auto')
+    parser.add_argument("--randomizer", choices=sorted(RANDOMIZERS), default='uniform')
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    user_manager = UserManager()
+    server = TetrisServer(user_manager, args.fall_interval, args.board, args.randomizer)
+    if args.unix:
+        listening = loop.create_unix_server(server.protocol, args.unix, backlog=BACKLOG)
+        address = args.unix
+    else:
+        listening = loop.create_server(server.protocol, args.host, args.port, backlog=BACKLOG)
+        address = f"{args.host}:{args.port}"
+    listener = loop.run_until_complete(listening)
+    try:
+        loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    except (NotImplementedError, AttributeError):  # Windows 不支持
+        pass
+    print(f"listening on {address}", flush=True)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        loop.run_until_complete(listener.wait_closed())
+        server.close_sessions()
+        loop.run_until_complete(asyncio.sleep(0))
+        user_manager.close()
+        loop.close()
+        print(f"games finished: {server.games_finished}  inputs: {server.inputs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+# 增量编码的游戏状态流（不依赖pygame）
+#
+# 每次状态变化输出一帧紧凑的二进制数据，观战者或远程渲染器只靠这些帧
+# 就能重建出完全相同的棋盘、当前方块、下一个方块和分数。
+#
+# 帧格式（小端；变长整数每字节7位，最高位为1表示后面还有）：
+#   关键帧  0x01 宽(1) 高(2) 各行格子(每格4位，每字节两格) 当前方块 下一个(1) 分数 行数 结束(1)
+#   增量帧  0x02 标志(1)，后面按下列顺序跟着标志位对应的数据：
+#     CLEARED  消除的行数(1) + 各行号；先删除这些行，再在顶部补上空行
+#     CELLS    变化的格子数 + 每格一个变长整数 (间隔 << 4 | 编号)，
+#              格子按 行*宽+列 编号，间隔从上一个变化格子的下一格算起
+#     PIECE    当前方块 类型(1) 旋转(1) x(1，有符号) y(2，有符号)
+#     NEXT     下一个方块类型(1)
+#     SCORE    分数、行数
+#     OVER     游戏是否结束(1)
+# 只有方块锁定时棋盘才会变化，平时的增量帧只有方块位置，共7个字节。
+# 编码器每隔 KEYFRAME_INTERVAL 帧输出一个关键帧，中途加入的观战者从关键帧开始解码。
+# 在套接字等字节流上传输时，每帧前面加一个变长整数表示长度（pack_frame / FrameReader）。
+#
+#   python tetris_stream.py 用户名 --port 7777     以文字方式观看服务器上某个玩家的游戏
+import argparse
+import socket
+import struct
+
+from tetris_pieces import ROTATIONS
+
+KEYFRAME = 1
+DELTA = 2
+
+# 增量帧的标志位
+CLEARED = 1
+CELLS = 2
+PIECE = 4
+NEXT = 8
+SCORE = 16
+OVER = 32
+
+KEYFRAME_INTERVAL = 300  # 每隔多少帧输出一个关键帧
+KEY_HEADER = struct.Struct('<BBH')
+PIECE_STATE = struct.Struct('<BBbh')
+
+
+class StreamError(Exception):
+    pass
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    # 返回 (值, 下一个位置)；数据不完整时抛出 IndexError
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def pack_frame(frame):
+    out = bytearray()
+    write_varint(out, len(frame))
+    out += frame
+    return bytes(out)
+
+
+class FrameReader:
+    # 把字节流切分成帧，数据可以在任意位置断开
+    def __init__(self):
+        self.buffer = b''
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        pos = 0
+        buffer = self.buffer
+        while True:
+            try:
+                length, start = read_varint(buffer, pos)
+            except IndexError:
+                break
+            if start + length > len(buffer):
+                break
+            frames.append(buffer[start:start + length])
+            pos = start + length
+        self.buffer = buffer[pos:]
+        return frames
+
+
+def piece_state(piece):
+    return piece.kind, piece.rotation, piece.x, piece.y
+
+
+class StreamEncoder:
+    # 记住上一次发送的状态，每次 encode() 只输出与它的差别
+    def __init__(self, engine, keyframe_interval=KEYFRAME_INTERVAL):
+        self.engine = engine
+        self.keyframe_interval = keyframe_interval
+        self.rows = None
+        self.since_keyframe = 0
+
+    def keyframe(self):
+        engine = self.engine
+        board = engine.board
+        rows = board.row_kinds()
+        out = bytearray(KEY_HEADER.pack(KEYFRAME, board.width, board.height))
+        row_bytes = (board.width + 1) // 2
+        for kinds in rows:
+            out += kinds.to_bytes(row_bytes, 'little')
+        self.piece = piece_state(engine.current_piece)
+        out += PIECE_STATE.pack(*self.piece)
+        self.next_kind = engine.next_piece.kind
+        out.append(self.next_kind)
+        self.score = engine.score
+        self.lines = engine.lines
+        write_varint(out, self.score)
+        write_varint(out, self.lines)
+        self.game_over = engine.game_over
+        out.append(int(self.game_over))
+        self.rows = list(rows)
+        self.pieces = engine.pieces
+        self.since_keyframe = 0
+        return bytes(out)
+
+    def encode(self):
+        # 返回一帧；状态没有变化时返回None
+        if self.rows is None or self.since_keyframe >= self.keyframe_interval:
+            return self.keyframe()
+        engine = self.engine
+        flags = 0
+        out = bytearray(2)
+        if engine.pieces != self.pieces:
+            flags |= self.encode_board(out)
+        piece = piece_state(engine.current_piece)
+        if piece != self.piece:
+            flags |= PIECE
+            out += PIECE_STATE.pack(*piece)
+            self.piece = piece
+        if engine.next_piece.kind != self.next_kind:
+            flags |= NEXT
+            self.next_kind = engine.next_piece.kind
+            out.append(self.next_kind)
+        if engine.score != self.score or engine.lines != self.lines:
+            flags |= SCORE
+            self.score = engine.score
+            self.lines = engine.lines
+            write_varint(out, self.score)
+            write_varint(out, self.lines)
+        if engine.game_over != self.game_over:
+            flags |= OVER
+            self.game_over = engine.game_over
+            out.append(int(self.game_over))
+        if not flags:
+            return None
+        out[0] = DELTA
+        out[1] = flags
+        self.since_keyframe += 1
+        return bytes(out)
+
+    def encode_board(self, out):
+        # 方块锁定过：先写消除的行，再写与（删除这些行之后的）旧棋盘不同的格子
+        engine = self.engine
+        board = engine.board
+        rows = self.rows
+        flags = 0
+        # 只有恰好锁定了一个方块时，board.cleared_rows 才对应这次的变化
+        if engine.last_cleared and engine.pieces == self.pieces + 1:
+            cleared = board.cleared_rows
+            flags |= CLEARED
+            out.append(len(cleared))
+            for row in cleared:
+                write_varint(out, row)
+            removed = set(cleared)
+            rows = [0] * len(cleared) + [kinds for i, kinds in enumerate(rows) if i not in removed]
+        new_rows = board.row_kinds()
+        width = board.width
+        cells = bytearray()
+        count = 0
+        last = 0
+        for i, (old, new) in enumerate(zip(rows, new_rows)):
+            if old == new:
+                continue
+            diff = old ^ new
+            col = 0
+            while diff:
+                if diff & 15:
+                    index = i * width + col
+                    write_varint(cells, (index - last) << 4 | (new >> (4 * col) & 15))
+                    last = index + 1
+                    count += 1
+                diff >>= 4
+                col += 1
+        if count:
+            flags |= CELLS
+            write_varint(out, count)
+            out += cells
+        self.rows = list(new_rows)
+        self.pieces = engine.pieces
+        return flags
+
+
+class StreamDecoder:
+    # 由帧重建状态；收到第一个关键帧之前的增量帧被忽略
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.rows = None
+        self.piece = None  # (类型, 旋转, x, y)
+        self.next_kind = None
+        self.score = 0
+        self.lines = 0
+        self.game_over = False
+
+    @property
+    def synced(self):
+        return self.rows is not None
+
+    def apply(self, frame):
+        # 返回这一帧是否被使用
+        if frame[0] == KEYFRAME:
+            self.apply_keyframe(frame)
+        elif frame[0] == DELTA:
+            if self.rows is None:
+                return False
+            self.apply_delta(frame)
+        else:
+            raise StreamError(f"未知的帧类型: {frame[0]}")
+        return True
+
+    def apply_keyframe(self, frame):
+        _, self.width, self.height = KEY_HEADER.unpack_from(frame)
+        pos = KEY_HEADER.size
+        row_bytes = (self.width + 1) // 2
+        rows = []
+        for _ in range(self.height):
+            rows.append(int.from_bytes(frame[pos:pos + row_bytes], 'little'))
+            pos += row_bytes
+        self.rows = rows
+        self.piece = PIECE_STATE.unpack_from(frame, pos)
+        pos += PIECE_STATE.size
+        self.next_kind = frame[pos]
+        self.score, pos = read_varint(frame, pos + 1)
+        self.lines, pos = read_varint(frame, pos)
+        self.game_over = bool(frame[pos])
+
+    def apply_delta(self, frame):
+        flags = frame[1]
+        pos = 2
+        if flags & CLEARED:
+            count = frame[pos]
+            pos += 1
+            removed = set()
+            for _ in range(count):
+                row, pos = read_varint(frame, pos)
+                removed.add(row)
+            self.rows = [0] * count + [kinds for i, kinds in enumerate(self.rows) if i not in removed]
+        if flags & CELLS:
+            rows = self.rows
+            width = self.width
+            count, pos = read_varint(frame, pos)
+            index = 0
+            for _ in range(count):
+                value, pos = read_varint(frame, pos)
+                index += value >> 4
+                row, col = divmod(index, width)
+                shift = 4 * col
+                rows[row] = rows[row] & ~(15 << shift) | (value & 15) << shift
+                index += 1
+        if flags & PIECE:
+            self.piece = PIECE_STATE.unpack_from(frame, pos)
+            pos += PIECE_STATE.size
+        if flags & NEXT:
+            self.next_kind = frame[pos]
+            pos += 1
+        if flags & SCORE:
+            self.score, pos = read_varint(frame, pos)
+            self.lines, pos = read_varint(frame, pos)
+        if flags & OVER:
+            self.game_over = bool(frame[pos])
+
+    def cell(self, row, col):
+        return self.rows[row] >> (4 * col) & 15
+
+    def row_kinds(self):
+        return tuple(self.rows)
+
+    def piece_cells(self):
+        # 当前方块占据的 (行, 列)
+        kind, rotation, x, y = self.piece
+        return [(y + i, x + j) for i, j in ROTATIONS[kind][rotation].cells]
+
+    def render_text(self):
+        piece = set(self.piece_cells())
+        lines = []
+        for i in range(self.height):
+            lines.append(''.join('@' if (i, j) in piece else '#' if self.cell(i, j) else '.'
+                                 for j in range(self.width)))
+        lines.append(f"score {self.score}  lines {self.lines}  next {self.next_kind}"
+                     + ("  GAME OVER" if self.game_over else ""))
+        return '\n'.join(lines)
+
+
+def watch(host, port, username):
+    # 文字观战：每次方块锁定时打印一次棋盘
+    connection = socket.create_connection((host, port))
+    connection.sendall(f"WATCH {username}\n".encode('utf-8'))
+    data = b''
+    while b'\n' not in data:
+        chunk = connection.recv(4096)
+        if not chunk:
+            raise StreamError("服务器关闭了连接")
+        data += chunk
+    reply, data = data.split(b'\n', 1)
+    if not reply.startswith(b'OK'):
+        raise StreamError(reply.decode('utf-8'))
+    reader = FrameReader()
+    decoder = StreamDecoder()
+    frames = 0
+    received = 0
+    while True:
+        for frame in reader.feed(data):
+            frames += 1
+            received += len(frame)
+            if decoder.apply(frame) and (frame[0] == KEYFRAME or frame[1] & (CELLS | OVER)):
+                print(decoder.render_text())
+                print(f"frames {frames}  average {received / frames:.1f} bytes/frame\n", flush=True)
+        data = connection.recv(4096)
+        if not data:
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以文字方式观看服务器上的游戏")
+    parser.add_argument("username")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    args = parser.parse_args()
+    try:
+        watch(args.host, args.port, args.username)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
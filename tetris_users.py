@@ -0,0 +1,368 @@
+# 用户数据管理（不依赖pygame）
+#
+# 用户数据通过可替换的存储后端保存：
+#   SqliteUserStore  每次注册或更新成绩只在事务中写一行（默认）
+#   JsonUserStore    原来的JSON文件，每次保存都重写整个文件（没有sqlite3时使用）
+# 第一次使用SQLite时会自动导入已有的JSON用户文件。
+#
+# 默认再包一层 WriteBehindStore：界面线程只把改动过的记录放进队列，
+# 由后台线程合并后写盘，退出时把剩余的改动全部写完。
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from tetris_leaderboard import Leaderboard
+
+try:
+    import sqlite3
+except ImportError:  # 某些精简版Python没有sqlite3
+    sqlite3 = None
+
+# 用户数据文件
+USER_DATA_FILE = "tetris_users.json"
+USER_DB_FILE = "tetris_users.db"
+
+USER_FIELDS = ("username", "password", "highest_score", "lowest_score", "game_count", "last_played")
+# 旧版本的JSON记录可能缺少某些字段，导入时用这些值补上
+USER_DEFAULTS = {"highest_score": 0, "lowest_score": 0, "game_count": 0, "last_played": ""}
+
+# 后台写盘的合并时间窗口（秒），也是进程崩溃时最多丢失的改动时长
+FLUSH_INTERVAL = 1.0
+
+
+def with_defaults(record):
+    # 返回记录的副本，缺少的字段补上默认值，原有字段的顺序不变
+    record = dict(record)
+    for field, value in USER_DEFAULTS.items():
+        record.setdefault(field, value)
+    return record
+
+
+# 存储后端的接口：
+#   load()                  返回 {用户ID: 记录}，调用方可以随意修改返回的字典
+#   save_records(records)   保存若干条改动过的记录 {用户ID: 记录}
+#   save_all(users)         保存全部用户
+#   close()
+
+class JsonUserStore:
+    def __init__(self, path=USER_DATA_FILE):
+        self.path = path
+        self.records = {}  # 自己保存一份数据，整体重写时不需要读调用方的字典
+
+    def load(self):
+        self.records = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.records = json.load(f)
+            except:
+                self.records = {}
+        if not isinstance(self.records, dict):
+            self.records = {}
+        # 跳过不是字典的记录（文件被手工改坏时），旧版本缺少的字段用默认值补上
+        return {user_id: with_defaults(record) for user_id, record in self.records.items()
+                if isinstance(record, dict)}
+
+    def write_file(self):
+        # 先写临时文件再替换，写到一半崩溃也不会损坏原文件
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, ensure_ascii=False, indent=4)
+        os.replace(temp_path, self.path)
+
+    def save_all(self, users):
+        self.records = {user_id: dict(record) for user_id, record in users.items()}
+        self.write_file()
+
+    def save_records(self, records):
+        # JSON文件只能整体重写
+        self.records.update(records)
+        self.write_file()
+
+    def close(self):
+        pass
+
+
+class SqliteUserStore:
+    def __init__(self, path=USER_DB_FILE, json_path=USER_DATA_FILE):
+        self.path = path
+        # 连接在后台写盘线程中使用，同一时刻只有一个线程访问
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "user_id TEXT PRIMARY KEY, username TEXT NOT NULL UNIQUE, password TEXT NOT NULL, "
+                "highest_score INTEGER NOT NULL DEFAULT 0, lowest_score INTEGER NOT NULL DEFAULT 0, "
+                "game_count INTEGER NOT NULL DEFAULT 0, last_played TEXT NOT NULL DEFAULT '')")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if json_path:
+            self.migrate_json(json_path)
+
+    def migrate_json(self, json_path):
+        # 只迁移一次：数据库中记录了迁移来源后不再导入
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from'").fetchone():
+            return
+        rows = []
+        skipped = 0
+        for user_id, record in JsonUserStore(json_path).load().items():
+            row = self._legacy_row(user_id, record)
+            if row is None:
+                skipped += 1
+            else:
+                rows.append(row)
+        if skipped:
+            print(f"导入用户数据时跳过了 {skipped} 条无法识别的记录", file=sys.stderr)
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT INTO meta VALUES ('migrated_from', ?)", (os.path.abspath(json_path),))
+
+    @staticmethod
+    def _legacy_row(user_id, record):
+        # 缺少的字段用默认值补上；没有用户名或密码、或者字段类型不对的记录返回None
+        if not isinstance(record.get("username"), str) or not isinstance(record.get("password"), str):
+            return None
+        row = SqliteUserStore._row(user_id, record)
+        for field, value in zip(USER_FIELDS, row[1:]):
+            if not isinstance(value, type(USER_DEFAULTS.get(field, ""))) or isinstance(value, bool):
+                return None
+        return row
+
+    @staticmethod
+    def _row(user_id, record):
+        return (user_id,) + tuple(record.get(field, USER_DEFAULTS.get(field)) for field in USER_FIELDS)
+
+    def load(self):
+        cursor = self.conn.execute("SELECT user_id, %s FROM users" % ", ".join(USER_FIELDS))
+        return {row[0]: dict(zip(USER_FIELDS, row[1:])) for row in cursor}
+
+    def save_all(self, users):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (self._row(user_id, record) for user_id, record in users.items()))
+
+    def save_records(self, records):
+        # 只写改动过的行，一个事务完成，与用户总数无关
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (self._row(user_id, record) for user_id, record in records.items()))
+
+    def close(self):
+        self.conn.close()
+
+
+class WriteBehindStore:
+    # 包装另一个存储后端，写操作交给后台线程完成
+    def __init__(self, store, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.pending = {}  # 用户ID -> 最新的记录副本，同一用户的多次改动合并为一次
+        self.pending_all = None  # save_all 的快照
+        self.writing = False
+        self.flushing = 0  # 正在等待写完的 flush() 调用数
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="user-store-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def load(self):
+        self.flush()
+        return self.store.load()
+
+    def save_records(self, records):
+        with self.condition:
+            self.pending.update(records)
+            self.condition.notify_all()
+
+    def save_all(self, users):
+        snapshot = {user_id: dict(record) for user_id, record in users.items()}
+        with self.condition:
+            self.pending_all = snapshot
+            self.pending.clear()
+            self.condition.notify_all()
+
+    def flush(self):
+        # 等待队列中的改动全部写完
+        with self.condition:
+            self.flushing += 1
+            self.condition.notify_all()
+            try:
+                while self.pending or self.pending_all is not None or self.writing:
+                    if not self.thread.is_alive():
+                        break
+                    self.condition.wait(0.1)
+            finally:
+                self.flushing -= 1
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.store.close()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and self.pending_all is None and not self.closed:
+                    self.condition.wait()
+                # 等一个时间窗口，把这段时间内的改动合并成一次写入
+                deadline = time.monotonic() + self.flush_interval
+                while not self.closed and not self.flushing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                records, self.pending = self.pending, {}
+                snapshot, self.pending_all = self.pending_all, None
+                if not records and snapshot is None and self.closed:
+                    return
+                self.writing = True
+            try:
+                if snapshot is not None:
+                    self.store.save_all(snapshot)
+                if records:
+                    self.store.save_records(records)
+            except Exception as e:
+                print(f"保存用户数据失败: {e}", file=sys.stderr)
+                with self.condition:
+                    # 放回队列等下次重试，期间更新过的记录以新的为准
+                    records.update(self.pending)
+                    self.pending = records
+                    if snapshot is not None and self.pending_all is None:
+                        self.pending_all = snapshot
+                    if self.closed:
+                        self.writing = False
+                        self.condition.notify_all()
+                        return
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+
+def open_user_store(backend=None, json_path=USER_DATA_FILE, db_path=USER_DB_FILE, write_behind=False):
+    # 默认使用SQLite，不可用时退回JSON文件
+    if backend is None:
+        backend = 'sqlite' if sqlite3 is not None else 'json'
+    if backend == 'sqlite':
+        store = SqliteUserStore(db_path, json_path)
+    elif backend == 'json':
+        store = JsonUserStore(json_path)
+    else:
+        raise ValueError(f"未知的存储后端: {backend}")
+    return WriteBehindStore(store) if write_behind else store
+
+
+class UserManager:
+    def __init__(self, store=None):
+        self.users = {}
+        self.current_user = None
+        self.username_index = {}  # 用户名 -> 用户ID
+        self.max_user_id = 0  # 当前最大的数字用户ID
+        self.leaderboard = Leaderboard()
+        self.store = store if store is not None else open_user_store(write_behind=True)
+        self.load_users()
+
+    def load_users(self):
+        self.users = self.store.load()
+        self.build_index()
+        self.leaderboard.rebuild(self.users)
+
+    def build_index(self):
+        # 加载时建立一次索引，之后随注册增量更新，self.users 的结构保持不变
+        self.username_index = {}
+        self.max_user_id = 0
+        for user_id, user_data in self.users.items():
+            self.username_index.setdefault(user_data.get("username"), user_id)
+            self.track_user_id(user_id)
+
+    def track_user_id(self, user_id):
+        try:
+            id_num = int(user_id)
+        except ValueError:
+            return
+        if id_num > self.max_user_id:
+            self.max_user_id = id_num
+
+    def save_users(self):
+        self.store.save_all(self.users)
+
+    def save_user(self, user_id):
+        # 交给存储后端的是记录的副本，之后修改 self.users 不会影响正在写盘的数据
+        self.store.save_records({user_id: dict(self.users[user_id])})
+
+    def generate_user_id(self):
+        # 生成新的用户ID，从00001开始累加
+        return f"{self.max_user_id + 1:05d}"
+
+    def register_user(self, username, password):
+        # 检查用户名是否已存在
+        if username in self.username_index:
+            return False, "用户名已存在"
+
+        # 生成新的用户ID
+        user_id = self.generate_user_id()
+
+        self.users[user_id] = {
+            "username": username,
+            "password": password,
+            "highest_score": 0,
+            "lowest_score": 0,
+            "game_count": 0,
+            "last_played": ""
+        }
+        self.username_index[username] = user_id
+        self.track_user_id(user_id)
+        self.save_user(user_id)
+        return True, f"注册成功，您的用户名是: {username}"
+
+    def login(self, username, password):
+        # 通过用户名索引查找用户
+        user_id = self.username_index.get(username)
+        if user_id is None:
+            return False, "用户不存在"
+
+        if self.users[user_id]["password"] != password:
+            return False, "密码错误"
+
+        self.current_user = user_id
+        return True, "登录成功"
+
+    def update_user_stats(self, score, user_id=None):
+        # 默认记到当前登录的用户；服务器同时有很多玩家，需要显式指定用户ID
+        if user_id is None:
+            user_id = self.current_user
+        if not user_id:
+            return
+
+        user = self.users[user_id]
+        user["game_count"] += 1
+        user["last_played"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # 更新最高分
+        if score > user["highest_score"]:
+            user["highest_score"] = score
+
+        # 更新最低分（如果是第一次玩或者当前分数低于最低分）
+        if user["lowest_score"] == 0 or score < user["lowest_score"]:
+            user["lowest_score"] = score
+
+        self.leaderboard.update(user_id, user["highest_score"])
+        self.save_user(user_id)
+
+    def get_rank(self, user_id=None):
+        # 返回 (名次, 上榜人数)，没有成绩时名次为None
+        if user_id is None:
+            user_id = self.current_user
+        return self.leaderboard.rank(user_id), len(self.leaderboard)
+
+    def close(self):
+        self.store.close()